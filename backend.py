@@ -1,9 +1,24 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, conint
+from typing import Any, Dict, List, Optional
+from collections import OrderedDict
+from itertools import count
+import json
+import threading
+import time
 import networkx as nx
+import numpy as np
 from fastapi.middleware.cors import CORSMiddleware
 
+import graph_store
+import metrics
+from eligibility import EligibilityIndex
+import model_service
+import simulation_jobs
+from patient_table import INT32_MAX, INT32_MIN, PatientTable
+from scoring import patient_features, rank_treatments, score_matrix
+
 
 app = FastAPI()
 
@@ -17,23 +32,60 @@ app.add_middleware(
 )
 
 
+REQUEST_SECONDS = metrics.REGISTRY.histogram(
+    "http_request_duration_seconds", "Latency of HTTP requests until the response headers are sent.",
+    ("method", "route", "status"),
+)
+
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template, not by path, to keep one series per endpoint
+        route = request.scope.get("route")
+        REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method,
+                                route=getattr(route, "path", "unmatched"), status=status)
+
+
 # Create the graph globally
 G = None
+registry = None
+store = None
+jobs = None
+
+recommendation_cache = None
+eligibility_index = None
+
+# Example edges every new patient gets to parameters or treatments
+DEFAULT_PATIENT_EDGES = {"tumor_size": 0.7, "health_score": 0.8, "chemotherapy": 0.5}
+
+# Patients whose recommendations are kept in memory
+RECOMMENDATION_CACHE_SIZE = 10_000
+
+
+# Integer patient fields are stored in int32 columns
+Int32 = conint(ge=INT32_MIN, le=INT32_MAX)
 
 
 class PatientRequest(BaseModel):
-    age: int
+    age: Int32
     sex: str
     prior_treatments: Optional[str]
     concurrent_malignancies: bool
-    performance_status: int
-    anc: int
-    platelets: int
+    performance_status: Int32
+    anc: Int32
+    platelets: Int32
     bilirubin: float
-    ast: int
-    alt: int
+    ast: Int32
+    alt: Int32
     creatinine: float
-    creatinine_clearance: int
+    creatinine_clearance: Int32
     cancer_type: str
     cancer_stage: str
     comorbidities: List[str]
@@ -43,6 +95,42 @@ class PatientRequest(BaseModel):
     tumor_marker: Optional[str]
 
 
+# Optional fields of PatientRequest, the only ones an update may set to null
+NULLABLE_PATIENT_FIELDS = ("prior_treatments", "tumor_marker")
+
+
+class PatientUpdate(BaseModel):
+    age: Optional[Int32] = None
+    sex: Optional[str] = None
+    prior_treatments: Optional[str] = None
+    concurrent_malignancies: Optional[bool] = None
+    performance_status: Optional[Int32] = None
+    anc: Optional[Int32] = None
+    platelets: Optional[Int32] = None
+    bilirubin: Optional[float] = None
+    ast: Optional[Int32] = None
+    alt: Optional[Int32] = None
+    creatinine: Optional[float] = None
+    creatinine_clearance: Optional[Int32] = None
+    cancer_type: Optional[str] = None
+    cancer_stage: Optional[str] = None
+    comorbidities: Optional[List[str]] = None
+    weight_loss: Optional[bool] = None
+    nutritional_status: Optional[str] = None
+    mental_health: Optional[str] = None
+    tumor_marker: Optional[str] = None
+
+
+class DiagnosisRequest(BaseModel):
+    samples: List[Dict[str, float]]
+
+
+class SimulationRequest(BaseModel):
+    kind: str
+    parameters: Dict[str, Any] = {}
+    patient_id: Optional[str] = None
+
+
 # Helper functions
 def create_graph():
     G = nx.Graph()
@@ -56,73 +144,512 @@ def create_graph():
     return G
 
 
-def add_patient_to_graph(patient_data: dict):
-    global G
-    patient_id = f"patient_{len([n for n, d in G.nodes(data=True) if d.get('type') == 'patient']) + 1}"
-    G.add_node(patient_id, type="patient", **patient_data)
+def _changed_fields(current: dict, changes: dict) -> dict:
+    # Fields of `changes` that differ from the `current` record; comorbidities compare as sets
+    return {
+        name: value for name, value in changes.items()
+        if (set(value or ()) != set(current[name]) if name == "comorbidities" else value != current[name])
+    }
+
+
+class GraphRegistry:
+    """Node-type index and patient ID counter kept next to the patient graph.
+
+    All node and edge additions go through the registry so that looking up the
+    nodes of a type, or allocating the next patient ID, does not scan the
+    graph, and so that they are written to `store` when one is given.
+
+    With a store, the store is the shared state between worker processes:
+    patient IDs are allocated from its counter, `commit` makes this worker's
+    additions visible to the others, and `sync` pulls in theirs.
+
+    Every change to a node's attributes or edges bumps its `version`, and every
+    change to a node of some type bumps that type's `type_version`, so results
+    derived from a node can be cached until it changes.
+
+    Patient records are kept in the columnar `patients` table; their graph
+    nodes only carry the type and the table row, and `row_ids` maps rows back
+    to patient IDs.
+    """
+
+    def __init__(self, graph: nx.Graph, store: Optional[graph_store.GraphStore] = None):
+        self.graph = graph
+        self.store = store
+        self._lock = threading.Lock()
+        self._by_type = {}  # type -> dict used as an insertion-ordered set
+        for node, data in graph.nodes(data=True):
+            self._by_type.setdefault(data.get("type"), {})[node] = None
+        self.patients = PatientTable()
+        self.row_ids = []
+        self._versions = {}
+        self._type_versions = {}
+        self._node_seq = self._edge_seq = 0
+        self.sync()
+        self._patient_ids = count(len(self.nodes_of_type("patient")) + 1)
+
+    def add_node(self, node, type: str, **attrs):
+        with self._lock:
+            self.graph.add_node(node, type=type, **attrs)
+            self._by_type.setdefault(type, {})[node] = None
+            self._touch(node, type)
+        if self.store is not None:
+            self.store.add_node(node, type, attrs)
+
+    def add_patient(self, patient_id, patient_data: dict):
+        with self._lock:
+            self._put_patient(patient_id, patient_data)
+        if self.store is not None:
+            self.store.add_node(patient_id, "patient", patient_data)
+
+    def _put_patient(self, patient_id, patient_data):
+        row = self.graph.nodes[patient_id].get("row") if patient_id in self.graph else None
+        if row is None:
+            row = self.patients.append(patient_data)
+            self.row_ids.append(patient_id)
+            self.graph.add_node(patient_id, type="patient", row=row)
+            self._by_type.setdefault("patient", {})[patient_id] = None
+        else:
+            self.patients.set(row, patient_data)
+        self._touch(patient_id, "patient")
+
+    def update_patient(self, patient_id, changes: dict):
+        """Overwrite some fields of an existing patient in place.
+
+        Fields whose value is unchanged are skipped; comorbidities are compared
+        as sets. Only the changed fields are written to the store, which
+        merges them into the stored record, so concurrent updates of other
+        fields by other workers are kept.
+
+        Returns:
+            tuple: (changed, versions) with the fields that changed and the
+            patient's version (before, after) the write.
+        """
+        with self._lock:
+            row = self.graph.nodes[patient_id]["row"]
+            before = int(self.patients.versions[row])
+            current = self.patients.get(row)
+            changed = _changed_fields(current, changes)
+            if changed:
+                self._put_patient(patient_id, changed)
+            after = int(self.patients.versions[row])
+        if changed and self.store is not None:
+            self.store.update_node(patient_id, changed)
+        return changed, (before, after)
+
+    def patient(self, patient_id) -> dict:
+        return self.patients.get(self.graph.nodes[patient_id]["row"])
+
+    def add_edge(self, u, v, **attrs):
+        with self._lock:
+            self.graph.add_edge(u, v, **attrs)
+            self._touch(u)
+            self._touch(v)
+        if self.store is not None:
+            self.store.add_edge(u, v, attrs)
+
+    def _touch(self, node, type=None):
+        row = self.graph.nodes[node].get("row") if node in self.graph else None
+        if row is not None:
+            self.patients.touch(row)
+        else:
+            self._versions[node] = self._versions.get(node, 0) + 1
+        if type is not None:
+            self._type_versions[type] = self._type_versions.get(type, 0) + 1
+
+    def version(self, node) -> int:
+        row = self.graph.nodes[node].get("row") if node in self.graph else None
+        if row is not None:
+            return int(self.patients.versions[row])
+        return self._versions.get(node, 0)
+
+    def type_version(self, type: str) -> int:
+        return self._type_versions.get(type, 0)
+
+    def nodes_of_type(self, type: str) -> list:
+        return list(self._by_type.get(type, ()))
+
+    def count(self, type: str) -> int:
+        return len(self._by_type.get(type, ()))
+
+    def counts(self) -> Dict[str, int]:
+        """Number of nodes of every type."""
+        with self._lock:
+            return {type: len(nodes) for type, nodes in self._by_type.items()}
+
+    def next_patient_id(self) -> str:
+        return self.next_patient_ids(1)[0]
+
+    def next_patient_ids(self, n: int) -> List[str]:
+        if self.store is not None:
+            first = self.store.allocate("patient", n, start=self.count("patient"))
+            return [f"patient_{i}" for i in range(first, first + n)]
+        with self._lock:
+            return [f"patient_{next(self._patient_ids)}" for _ in range(n)]
+
+    def commit(self):
+        """Write pending additions to the store, making them visible to other workers."""
+        if self.store is not None:
+            self.store.flush()
+
+    def sync(self):
+        """Add the nodes and edges other workers committed since the last sync."""
+        if self.store is None or not self.store.changed():
+            return
+        with self._lock:
+            nodes, edges, self._node_seq, self._edge_seq = self.store.changes_since(self._node_seq, self._edge_seq)
+            new_patients = {}
+            for node, attrs in nodes:
+                type = attrs.pop("type")
+                if type != "patient":
+                    self.graph.add_node(node, type=type, **attrs)
+                    self._by_type.setdefault(type, {})[node] = None
+                    self._touch(node, type)
+                elif node in self.graph:
+                    # Our own writes come back too; only apply real changes,
+                    # so they do not invalidate cached results again
+                    changed = _changed_fields(self.patient(node), attrs)
+                    if changed:
+                        self._put_patient(node, changed)
+                else:
+                    new_patients[node] = attrs
+            # Patients seen for the first time are appended to the table in bulk
+            rows = self.patients.extend(new_patients.values())
+            self.row_ids.extend(new_patients)
+            self.graph.add_nodes_from((node, {"type": "patient", "row": row}) for node, row in zip(new_patients, rows))
+            self._by_type.setdefault("patient", {}).update(dict.fromkeys(new_patients))
+            if new_patients:
+                self._type_versions["patient"] = self._type_versions.get("patient", 0) + 1
+            edges = [(u, v, attrs) for u, v, attrs in edges if self.graph.edges.get((u, v)) != attrs]
+            self.graph.add_edges_from(edges)
+            for u, v, _ in edges:
+                self._touch(u)
+                self._touch(v)
+
+
+class RecommendationCache:
+    """LRU cache of ranked treatments per patient.
+
+    Entries remember the patient's registry version and the treatment-set
+    version they were computed at, and are recomputed when either changed.
+    """
+
+    def __init__(self, maxsize: int = RECOMMENDATION_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # patient_id -> (versions, recommendations)
+        self.hits = self.misses = 0
+
+    def get(self, patient_id, versions):
+        with self._lock:
+            entry = self._entries.get(patient_id)
+            if entry is None or entry[0] != versions:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(patient_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, patient_id, versions, recommendations):
+        with self._lock:
+            self._entries[patient_id] = (versions, recommendations)
+            self._entries.move_to_end(patient_id)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+def patient_edge_weights(rows, treatments):
+    """Edge weights between the patients in table `rows` and `treatments`, shape (len(rows), len(treatments))."""
+    edges = G.edges
+    weights = np.zeros((len(rows), len(treatments)))
+    for i, row in enumerate(rows):
+        patient_id = registry.row_ids[row]
+        for j, treatment in enumerate(treatments):
+            weights[i, j] = edges.get((patient_id, treatment), {}).get("weight", 0)
+    return weights
+
+
+def update_eligibility_index():
+    """Bring the eligibility index up to date with patients added or changed since the last query."""
+    registry.sync()
+    eligibility_index.update(registry.nodes_of_type("treatment"))
+
+
+def add_patient_to_graph(patient_data: dict, patient_id: Optional[str] = None):
+    patient_id = patient_id or registry.next_patient_id()
+    registry.add_patient(patient_id, patient_data)
 
     # Add example edges to parameters or treatments
-    G.add_edge(patient_id, "tumor_size", weight=0.7)
-    G.add_edge(patient_id, "health_score", weight=0.8)
-    G.add_edge(patient_id, "chemotherapy", weight=0.5)
+    for node, weight in DEFAULT_PATIENT_EDGES.items():
+        registry.add_edge(patient_id, node, weight=weight)
     return patient_id
 
 
+def add_patients_to_graph(patients: List[dict]):
+    patient_ids = registry.next_patient_ids(len(patients))
+    return [add_patient_to_graph(patient_data, patient_id) for patient_data, patient_id in zip(patients, patient_ids)]
+
+
 def recommend_treatments(patient_id):
     global G
-    patient_data = G.nodes[patient_id]
-    anc = patient_data.get("anc")
-    platelets = patient_data.get("platelets")
-    bilirubin = patient_data.get("bilirubin")
-    ast = patient_data.get("ast")
-    alt = patient_data.get("alt")
-    creatinine_clearance = patient_data.get("creatinine_clearance")
-    performance_status = patient_data.get("performance_status")
-    comorbidities = patient_data.get("comorbidities")
-    weight_loss = patient_data.get("weight_loss")
-    nutritional_status = patient_data.get("nutritional_status")
-
-    treatment_scores = []
-    for treatment in [node for node, data in G.nodes(data=True) if data.get("type") == "treatment"]:
-        effectiveness = G.edges.get((patient_id, treatment), {}).get("weight", 0)
-
-        # Adjust effectiveness based on patient metrics
-        if anc < 1500 or platelets < 100000:
-            effectiveness -= 0.3
-        if bilirubin > 1.5 or (ast > 40 and alt > 40):
-            effectiveness -= 0.2
-        if creatinine_clearance < 60:
-            effectiveness -= 0.3
-        if performance_status > 2:
-            effectiveness -= 0.4
-        if "diabetes" in comorbidities and treatment == "chemotherapy":
-            effectiveness -= 0.2
-        if weight_loss or nutritional_status == "poor":
-            effectiveness -= 0.3
-
-        treatment_scores.append((treatment, max(effectiveness, 0)))
-
-    treatment_scores.sort(key=lambda x: x[1], reverse=True)
-    return treatment_scores
+    # Cached results are shared between callers; do not modify them
+    versions = (registry.version(patient_id), registry.type_version("treatment"))
+    recommendations = recommendation_cache.get(patient_id, versions)
+    if recommendations is not None:
+        return recommendations
+
+    treatments = registry.nodes_of_type("treatment")
+    edge_weights = [[G.edges.get((patient_id, treatment), {}).get("weight", 0) for treatment in treatments]]
+    with metrics.phase("recommend_treatments", "score"):
+        scores = score_matrix(registry.patients.features([G.nodes[patient_id]["row"]]), edge_weights, treatments)
+        recommendations = rank_treatments(scores[0], treatments)
+    recommendation_cache.put(patient_id, versions, recommendations)
+    return recommendations
+
+
+# Graph, cache and job gauges, read when /metrics is scraped
+def _graph_nodes():
+    if registry is not None:
+        return {(type,): count for type, count in registry.counts().items()}
+
+
+def _graph_edges():
+    if G is not None:
+        return G.number_of_edges()
+
+
+def _patient_table_bytes():
+    if registry is not None:
+        return registry.patients.nbytes
+
+
+def _recommendation_cache_lookups():
+    if recommendation_cache is not None:
+        return {("hit",): recommendation_cache.hits, ("miss",): recommendation_cache.misses}
+
+
+def _simulation_jobs():
+    if jobs is not None:
+        return jobs.counts()
+
+
+metrics.REGISTRY.gauge("graph_nodes", "Nodes in the patient graph.", _graph_nodes, ("type",))
+metrics.REGISTRY.gauge("graph_edges", "Edges in the patient graph.", _graph_edges)
+metrics.REGISTRY.gauge("patient_table_bytes", "Memory held by the patient table columns.", _patient_table_bytes)
+metrics.REGISTRY.gauge("recommendation_cache_lookups", "Recommendation cache lookups since startup.",
+                       _recommendation_cache_lookups, ("result",))
+metrics.REGISTRY.gauge("simulation_jobs", "Simulation jobs known to this worker.", _simulation_jobs, ("status",))
 
 
 # API Endpoints
 @app.on_event("startup")
 def startup_event():
-    global G
-    G = create_graph()
+    global G, registry, store, recommendation_cache, eligibility_index
+    if store is not None:
+        store.close()
+    # Patients stored by a previous run, or by other workers, are loaded on
+    # top of the predefined nodes
+    store = graph_store.open_store()
+    registry = GraphRegistry(create_graph(), store)
+    G = registry.graph
+    recommendation_cache = RecommendationCache()
+    eligibility_index = EligibilityIndex(registry.patients, patient_edge_weights)
+    if store is not None:
+        store.start()
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    global store, jobs
+    if store is not None:
+        store.close()
+        store = None
+    if jobs is not None:
+        jobs.shutdown()
+        jobs = None
+
+
+def get_job_queue():
+    # The job table is opened, and the worker pool started if no other
+    # worker runs it, on the first simulation request rather than at startup
+    global jobs
+    if jobs is None:
+        jobs = simulation_jobs.JobQueue()
+    return jobs
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    # Count the patients other workers added as well
+    if registry is not None:
+        registry.sync()
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 @app.post("/add_patient/")
 def add_patient(patient: PatientRequest):
     patient_data = patient.dict()
     patient_id = add_patient_to_graph(patient_data)
+    registry.commit()
     return {"message": "Patient added", "patient_id": patient_id}
 
 
+@app.patch("/patients/{patient_id}")
+def update_patient(patient_id: str, update: PatientUpdate):
+    # Only sync; `refresh` below falls back to a full re-evaluation on the
+    # next index update if the index missed earlier changes to this patient
+    registry.sync()
+    if registry.graph.nodes.get(patient_id, {}).get("type") != "patient":
+        return {"error": "Patient not found"}
+    changes = update.dict(exclude_unset=True)
+    missing = [name for name, value in changes.items() if value is None and name not in NULLABLE_PATIENT_FIELDS]
+    if missing:
+        return {"error": f"Fields cannot be null: {', '.join(missing)}"}
+    changed, versions = registry.update_patient(patient_id, changes)
+    registry.commit()
+
+    rules = None
+    if changed:
+        row = G.nodes[patient_id]["row"]
+        rules = eligibility_index.refresh(row, changed, versions)
+    if rules is not None:
+        # The index row is current, so it also refreshes the cached recommendations
+        recommendations = eligibility_index.recommendations(row)
+        recommendation_cache.put(patient_id, (versions[1], registry.type_version("treatment")), recommendations)
+    else:
+        recommendations = recommend_treatments(patient_id)
+    return {
+        "patient_id": patient_id,
+        "updated_fields": sorted(changed),
+        # None when the patient is left to a full re-evaluation
+        "reevaluated_rules": rules if changed else [],
+        "recommended_treatments": recommendations,
+    }
+
+
 @app.get("/recommend_treatments/{patient_id}")
 def get_recommendations(patient_id: str):
+    registry.sync()
     if patient_id not in G.nodes:
         return {"error": "Patient not found"}
     treatments = recommend_treatments(patient_id)
     return {"patient_id": patient_id, "recommended_treatments": treatments}
+
+
+@app.get("/patients/eligible")
+def get_eligible_patients(treatment: str, cancer_type: Optional[str] = None, cancer_stage: Optional[str] = None,
+                          limit: int = Query(1000, ge=0)):
+    update_eligibility_index()
+    if treatment not in eligibility_index.treatments:
+        return {"error": "Treatment not found"}
+    filters = {name: value for name, value in (("cancer_type", cancer_type), ("cancer_stage", cancer_stage))
+               if value is not None}
+    rows = eligibility_index.query(treatment, **filters)
+    return {
+        "treatment": treatment,
+        "count": len(rows),
+        "patient_ids": [registry.row_ids[row] for row in rows[:limit]],
+    }
+
+
+@app.get("/treatments/{treatment}/top_patients")
+def get_top_patients(treatment: str, k: int = Query(10, ge=0), eligible_only: bool = True, cancer_type: Optional[str] = None,
+                     cancer_stage: Optional[str] = None):
+    update_eligibility_index()
+    if treatment not in eligibility_index.treatments:
+        return {"error": "Treatment not found"}
+    filters = {name: value for name, value in (("cancer_type", cancer_type), ("cancer_stage", cancer_stage))
+               if value is not None}
+    rows, scores = eligibility_index.top_k(treatment, k, eligible_only, **filters)
+    return {
+        "treatment": treatment,
+        "patients": [{"patient_id": registry.row_ids[row], "score": float(score)} for row, score in zip(rows, scores)],
+    }
+
+
+def ndjson_response(records):
+    """Stream an iterable of JSON-serializable records as newline-delimited JSON."""
+    return StreamingResponse((json.dumps(record) + "\n" for record in records), media_type="application/x-ndjson")
+
+
+@app.post("/patients:batch")
+def add_patients_batch(patients: List[PatientRequest], stream: bool = False):
+    patient_ids = add_patients_to_graph([patient.dict() for patient in patients])
+    registry.commit()
+    if stream:
+        return ndjson_response({"patient_id": patient_id} for patient_id in patient_ids)
+    return {"message": "Patients added", "patient_ids": patient_ids}
+
+
+@app.post("/recommendations:batch")
+def get_recommendations_batch(patients: List[PatientRequest], stream: bool = False):
+    # Score the patients as they would be scored once added, without adding them
+    registry.sync()
+    treatments = registry.nodes_of_type("treatment")
+    edge_weights = [[DEFAULT_PATIENT_EDGES.get(treatment, 0) for treatment in treatments]] * len(patients)
+    scores = score_matrix(patient_features(patient.dict() for patient in patients), edge_weights, treatments)
+    results = (
+        {"index": index, "recommended_treatments": rank_treatments(row, treatments)}
+        for index, row in enumerate(scores)
+    )
+    if stream:
+        return ndjson_response(results)
+    return {"results": list(results)}
+
+
+@app.post("/predict_diagnosis")
+def predict_diagnosis(request: DiagnosisRequest):
+    try:
+        predictions = model_service.predict_diagnosis(request.samples)
+    except KeyError as exc:
+        return {"error": f"Missing feature: {exc.args[0]}"}
+    return {"predictions": predictions.tolist()}
+
+
+@app.post("/simulations")
+def submit_simulation(request: SimulationRequest):
+    if request.patient_id is not None:
+        registry.sync()
+        if request.patient_id not in G.nodes:
+            return {"error": "Patient not found"}
+    try:
+        job = get_job_queue().submit(request.kind, request.parameters, request.patient_id)
+    except ValueError as exc:
+        return {"error": str(exc)}
+    except simulation_jobs.QueueFull as exc:
+        return JSONResponse(status_code=429, content={"error": str(exc)})
+    return job.describe()
+
+
+@app.get("/simulations/{job_id}")
+def get_simulation(job_id: str):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return {"error": "Simulation not found"}
+    return job.describe()
+
+
+@app.get("/simulations/{job_id}/events")
+def stream_simulation(job_id: str):
+    job_queue = get_job_queue()
+    if job_queue.get(job_id) is None:
+        return {"error": "Simulation not found"}
+    return ndjson_response(simulation_jobs.watch(job_queue, job_id))
+
+
+@app.get("/simulations/{job_id}/result")
+def get_simulation_result(job_id: str):
+    job = get_job_queue().get(job_id, with_result=True)
+    if job is None:
+        return {"error": "Simulation not found"}
+    info = job.describe()
+    if info["status"] == "done":
+        info["result"] = job.result
+    return info
+
+
+@app.delete("/simulations/{job_id}")
+def cancel_simulation(job_id: str):
+    job = get_job_queue().cancel(job_id)
+    if job is None:
+        return {"error": "Simulation not found"}
+    return job.describe()
@@ -0,0 +1,316 @@
+"""Benchmarks for the simulators and the backend hot paths.
+
+Each benchmark is run at several sizes (cohort size, horizon length or graph
+size) and reports the median wall time, throughput and peak traced memory.
+
+    python bench.py                  # run and print results
+    python bench.py --save           # run and store the results as the baseline
+    python bench.py --check          # run and fail if slower or larger than the baseline
+    python bench.py --quick -k drug  # smaller sizes, only matching benchmarks
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+import numpy as np
+
+BASELINE_PATH = "bench_baseline.json"
+
+# Allowed slowdown against the baseline before --check fails
+DEFAULT_TOLERANCE = 0.25
+
+# Allowed growth of peak traced memory before --check fails; growth below
+# MEMORY_SLACK_BYTES is ignored, as small peaks vary from run to run
+DEFAULT_MEMORY_TOLERANCE = 0.25
+MEMORY_SLACK_BYTES = 2**20
+
+# name -> (parameter name, sizes, quick sizes, setup(size) returning (callable, items per call))
+BENCHMARKS = {}
+
+SAMPLE_PATIENT = dict(
+    age=55, sex="male", prior_treatments="none", concurrent_malignancies=False, performance_status=1,
+    anc=2000, platelets=150000, bilirubin=1.0, ast=30, alt=25, creatinine=1.2, creatinine_clearance=70,
+    cancer_type="lung", cancer_stage="II", comorbidities=[], weight_loss=False, nutritional_status="good",
+    mental_health="stable", tumor_marker=None,
+)
+
+
+def benchmark(name, param, sizes, quick_sizes):
+    def register(setup):
+        BENCHMARKS[name] = (param, sizes, quick_sizes, setup)
+        return setup
+    return register
+
+
+@benchmark("simulate1.simulate_patient_response", "patients", [100, 1000], [10, 100])
+def bench_patient_response(n):
+    import simulate1
+
+    sizes = np.random.default_rng(0).uniform(50, 250, n)
+
+    def run():
+        for size in sizes:
+            simulate1.simulate_patient_response(size, 50, 180, 70, 40)
+    return run, n
+
+
+# Keeps three (patients, 180) float64 trajectories, about 430 MB at 100k patients
+@benchmark("simulate1.simulate_cohort_response", "patients", [1000, 10_000, 100_000], [1000, 10_000])
+def bench_cohort_response(n):
+    import simulate1
+
+    sizes = np.random.default_rng(0).uniform(50, 250, n)
+    return (lambda: simulate1.simulate_cohort_response(sizes, 50, 180, 70, 40)), n
+
+
+@benchmark("tumor_simulation.simulate_tumor_growth", "steps", [100, 10_000, 100_000], [100, 1000])
+def bench_tumor_growth(steps):
+    import tumor_simulation
+
+    return (lambda: tumor_simulation.simulate_tumor_growth(0.02, steps=steps)), steps
+
+
+@benchmark("tumor_simulation.simulate_tumor_growth_batch", "tumors", [1000, 10_000, 100_000], [1000, 10_000])
+def bench_tumor_growth_batch(n):
+    import tumor_simulation
+
+    rates = np.random.default_rng(0).uniform(0.05, 0.5, n)
+    return (lambda: tumor_simulation.simulate_tumor_growth_batch(rates, 1000, 0.02, trajectories=False)), n
+
+
+@benchmark("drug_simulate.simulate_doxorubicin", "steps", [180, 8760, 87_600], [180, 8760])
+def bench_doxorubicin_dense(steps):
+    import drug_simulate
+
+    dt = 1 if steps <= 180 else 1 / 24
+    return (lambda: drug_simulate.simulate_doxorubicin(time_steps=steps, dt=dt)), steps
+
+
+@benchmark("drug_simulate.solve_doxorubicin", "steps", [180, 8760, 87_600, 876_000], [180, 8760])
+def bench_doxorubicin_solver(steps):
+    import drug_simulate
+
+    dt = 1 if steps <= 180 else 1 / 24
+    return (lambda: drug_simulate.solve_doxorubicin(time_steps=steps, dt=dt, steps=[steps - 1])), steps
+
+
+@benchmark("schedule_optimizer.optimize_schedule", "population", [256, 1024], [64, 256])
+def bench_schedule_optimizer(population):
+    import schedule_optimizer
+
+    return (lambda: schedule_optimizer.optimize_schedule(population=population)), population
+
+
+@benchmark("treatment_timeline.simulate_treatment", "days", [90, 3650], [90])
+def bench_treatment_timeline(days):
+    import treatment_timeline
+
+    return (lambda: treatment_timeline.simulate_treatment("chemotherapy", days)), days
+
+
+@benchmark("regimen.simulate_regimens", "regimens", [100, 10_000, 100_000], [100, 1000])
+def bench_regimens(n):
+    import regimen
+
+    regimens = [[("chemotherapy", i % 30 + 1, i % 30 + 20), ("radiation", i % 50 + 1, None)] for i in range(n)]
+    return (lambda: regimen.simulate_regimens(regimens, days=90)), n
+
+
+def _patient_graph(n):
+    import graphsim
+
+    G = graphsim.create_graph()
+    rng = np.random.default_rng(0)
+    for i in range(4, n + 4):
+        G.add_node(f"patient_{i}", type="patient", **SAMPLE_PATIENT)
+        for node in ("tumor_size", "health_score", ("chemotherapy", "immunotherapy", "radiation")[i % 3]):
+            G.add_edge(f"patient_{i}", node, weight=rng.random())
+    return G
+
+
+@benchmark("graphsim.edge_lookup_scores", "graph_patients", [10_000, 300_000], [1000, 10_000])
+def bench_edge_lookup_scores(n):
+    import graphsim
+
+    G = _patient_graph(n)
+
+    def run():
+        patients = [node for node, data in G.nodes(data=True) if data.get("type") == "patient"]
+        treatments = [node for node, data in G.nodes(data=True) if data.get("type") == "treatment"]
+        weights = [[G.edges.get((p, t), {}).get("weight", 0) for t in treatments] for p in patients]
+        graphsim.score_matrix(graphsim.patient_features(G.nodes[p] for p in patients), weights, treatments)
+    return run, n
+
+
+@benchmark("graphsim.score_graph", "graph_patients", [10_000, 300_000], [1000, 10_000])
+def bench_score_graph(n):
+    import graphsim
+
+    G = _patient_graph(n)
+    return (lambda: graphsim.score_graph(G)), n
+
+
+# Directory of the stores the backend benchmarks write, removed by `_remove_stores`
+_store_dir = None
+
+
+def _backend_with_patients(n):
+    global _store_dir
+    import backend
+    import graph_store
+
+    # Persist to a fresh store so the timings include the write path
+    if _store_dir is None:
+        _store_dir = tempfile.TemporaryDirectory(prefix="bench-graph-")
+    fd, graph_store.STORE_PATH = tempfile.mkstemp(suffix=".sqlite3", dir=_store_dir.name)
+    os.close(fd)
+    backend.startup_event()
+    backend.add_patients_to_graph([dict(SAMPLE_PATIENT) for _ in range(n)])
+    return backend
+
+
+@benchmark("backend.add_patient_to_graph", "graph_patients", [1000, 100_000], [100, 1000])
+def bench_add_patient(n):
+    backend = _backend_with_patients(n)
+    return (lambda: [backend.add_patient_to_graph(dict(SAMPLE_PATIENT)) for _ in range(100)]), 100
+
+
+@benchmark("backend.recommend_treatments", "graph_patients", [1000, 100_000], [100, 1000])
+def bench_recommend(n):
+    backend = _backend_with_patients(n)
+    patient_ids = [f"patient_{i}" for i in range(1, n + 1, max(1, n // 100))]
+    return (lambda: [backend.recommend_treatments(patient_id) for patient_id in patient_ids]), len(patient_ids)
+
+
+@benchmark("backend.recommend_treatments[uncached]", "graph_patients", [1000, 100_000], [100, 1000])
+def bench_recommend_uncached(n):
+    backend = _backend_with_patients(n)
+    patient_ids = [f"patient_{i}" for i in range(1, n + 1, max(1, n // 100))]
+
+    def run():
+        backend.recommendation_cache = backend.RecommendationCache()
+        for patient_id in patient_ids:
+            backend.recommend_treatments(patient_id)
+    return run, len(patient_ids)
+
+
+@benchmark("eligibility.top_k", "graph_patients", [1000, 100_000], [100, 1000])
+def bench_eligibility_top_k(n):
+    backend = _backend_with_patients(n)
+    backend.update_eligibility_index()
+
+    def run():
+        backend.update_eligibility_index()
+        return backend.eligibility_index.top_k("chemotherapy", 10, cancer_stage="II")
+    return run, n
+
+
+def _remove_stores():
+    global _store_dir
+    if _store_dir is not None:
+        sys.modules["backend"].shutdown_event()
+        _store_dir.cleanup()
+        _store_dir = None
+
+
+def measure(run, items, repeat):
+    """Median seconds per call, throughput and peak traced memory of one benchmark."""
+    run()  # warm up imports and caches
+    times = timeit.repeat(run, number=1, repeat=repeat)
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    seconds = statistics.median(times)
+    return {"seconds": seconds, "items_per_second": items / seconds if seconds else float("inf"), "peak_bytes": peak}
+
+
+def run_benchmarks(pattern=None, quick=False, repeat=5):
+    results = {}
+    try:
+        for name, (param, sizes, quick_sizes, setup) in BENCHMARKS.items():
+            if pattern and pattern not in name:
+                continue
+            for size in (quick_sizes if quick else sizes):
+                run, items = setup(size)
+                key = f"{name}[{param}={size}]"
+                results[key] = measure(run, items, repeat)
+                r = results[key]
+                print(f"{key:<60} {r['seconds'] * 1e3:>10.2f} ms {r['items_per_second']:>14.0f} /s "
+                      f"{r['peak_bytes'] / 2**20:>9.1f} MiB", flush=True)
+    finally:
+        _remove_stores()
+    return results
+
+
+def compare(results, baseline, tolerance, memory_tolerance=DEFAULT_MEMORY_TOLERANCE):
+    """Return the benchmarks that got slower or use more peak memory than the baseline allows.
+
+    Returns:
+        list: ``(key, metric, before, after)`` tuples with metric "seconds" or "peak_bytes".
+    """
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if not reference:
+            continue
+        if result["seconds"] > reference["seconds"] * (1 + tolerance):
+            regressions.append((key, "seconds", reference["seconds"], result["seconds"]))
+        peak, reference_peak = result["peak_bytes"], reference.get("peak_bytes")
+        if (reference_peak is not None and peak > reference_peak * (1 + memory_tolerance)
+                and peak - reference_peak > MEMORY_SLACK_BYTES):
+            regressions.append((key, "peak_bytes", reference_peak, peak))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="pattern", help="only run benchmarks whose name contains this text")
+    parser.add_argument("--quick", action="store_true", help="use the small sizes")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark (median is reported)")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file")
+    parser.add_argument("--save", action="store_true", help="store the results in the baseline file")
+    parser.add_argument("--check", action="store_true", help="exit with status 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed slowdown, e.g. 0.25")
+    parser.add_argument("--memory-tolerance", type=float, default=DEFAULT_MEMORY_TOLERANCE,
+                        help="allowed growth of peak memory, e.g. 0.25")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.pattern, args.quick, args.repeat)
+
+    if args.check:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}; run with --save first.")
+            return 1
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance, args.memory_tolerance)
+        for key, metric, before, after in regressions:
+            if metric == "seconds":
+                print(f"REGRESSION {key}: {before * 1e3:.2f} ms -> {after * 1e3:.2f} ms")
+            else:
+                print(f"REGRESSION {key}: peak {before / 2**20:.1f} MiB -> {after / 2**20:.1f} MiB")
+        if regressions:
+            return 1
+
+    if args.save:
+        baseline = {"results": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline["machine"] = {"python": sys.version.split()[0], "platform": platform.platform(),
+                               "numpy": np.__version__}
+        baseline["results"].update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,24 @@
+# Being at the repository root, this file also puts the top-level modules on
+# sys.path for tests run with plain `pytest`
+import pytest
+
+import graph_store
+from bench import SAMPLE_PATIENT
+
+
+@pytest.fixture
+def patient():
+    """A complete patient record, as accepted by `POST /add_patient/`."""
+    return dict(SAMPLE_PATIENT)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Test client of a backend started on an empty store."""
+    from fastapi.testclient import TestClient
+
+    import backend
+
+    monkeypatch.setattr(graph_store, "STORE_PATH", str(tmp_path / "graph.sqlite3"))
+    with TestClient(backend.app) as client:
+        yield client
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Directory holding the binary copies of source CSV files
+CACHE_DIR = os.environ.get("DATASET_CACHE_DIR", ".dataset_cache")
+
+# Bump when the binary layout or the preprocessing changes
+FORMAT_VERSION = 2
+
+# Rows read from the CSV per chunk while converting
+CHUNK_ROWS = 100_000
+
+# Columns that are not features
+ID_COLUMN = "id"
+TARGET_COLUMN = "diagnosis"
+DROPPED_COLUMNS = ("Unnamed: 32",)
+
+# Diagnosis encoding used by the preprocessed frame
+DIAGNOSIS_CODES = {"M": 1, "B": 0}
+
+_frames = {}
+_lock = threading.Lock()
+
+
+def load_dataset(file_path):
+    """Return the preprocessed dataset for a CSV file.
+
+    The CSV is converted once into memory-mapped NumPy files (float32
+    features, int8 diagnosis) and rebuilt only when the source
+    file's size or modification time changes. The frame is memoized per path,
+    so repeated calls return the same object; treat it as read-only.
+
+    The frame matches `simulate1.preprocess_dataset`: no id or empty columns,
+    diagnosis encoded as M=1 / B=0, and rows with missing values dropped.
+    """
+    path = os.path.abspath(file_path)
+    signature = source_signature(path)
+    with _lock:
+        cached = _frames.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        cache_path = _cache_path(path)
+        if not _is_current(_read_meta(cache_path), signature):
+            _convert(path, cache_path, signature)
+        frame = _open_frame(cache_path)
+        _frames[path] = (signature, frame)
+        return frame
+
+
+def source_signature(path):
+    """Size and modification time of a source file; a change means its derived data is stale."""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def _cache_path(path):
+    name = os.path.basename(path)
+    digest = hashlib.sha256(path.encode()).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"{name}-{digest}")
+
+
+def _read_meta(cache_path):
+    try:
+        with open(os.path.join(cache_path, "meta.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _is_current(meta, signature):
+    return meta is not None and meta.get("version") == FORMAT_VERSION and meta.get("source") == signature
+
+
+def _convert(path, cache_path, signature):
+    """Convert the CSV into binary column files, chunk by chunk."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(dir=CACHE_DIR)
+    try:
+        header = pd.read_csv(path, nrows=0).columns
+        feature_columns = [c for c in header if c not in (ID_COLUMN, TARGET_COLUMN, *DROPPED_COLUMNS)]
+        dtypes = {c: np.float32 for c in feature_columns}
+
+        rows = 0
+        with open(os.path.join(tmp_path, "features.f4"), "wb") as features, \
+                open(os.path.join(tmp_path, "diagnosis.i1"), "wb") as diagnosis:
+            reader = pd.read_csv(path, usecols=lambda c: c not in (ID_COLUMN, *DROPPED_COLUMNS), dtype=dtypes,
+                                 chunksize=CHUNK_ROWS)
+            for chunk in reader:
+                chunk[TARGET_COLUMN] = chunk[TARGET_COLUMN].map(DIAGNOSIS_CODES)
+                chunk = chunk.dropna()
+                features.write(np.ascontiguousarray(chunk[feature_columns].to_numpy(np.float32)).tobytes())
+                diagnosis.write(chunk[TARGET_COLUMN].to_numpy(np.int8).tobytes())
+                rows += len(chunk)
+
+        meta = {"version": FORMAT_VERSION, "source": signature, "rows": rows, "columns": feature_columns}
+        with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+        shutil.rmtree(cache_path, ignore_errors=True)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+
+def _open_frame(cache_path):
+    meta = _read_meta(cache_path)
+    rows, columns = meta["rows"], meta["columns"]
+    features = np.memmap(os.path.join(cache_path, "features.f4"), dtype=np.float32, mode="r",
+                         shape=(rows, len(columns))) if rows else np.empty((0, len(columns)), np.float32)
+    diagnosis = np.memmap(os.path.join(cache_path, "diagnosis.i1"), dtype=np.int8, mode="r",
+                          shape=(rows,)) if rows else np.empty(0, np.int8)
+
+    frame = pd.DataFrame(features, columns=columns, copy=False)
+    frame.insert(0, TARGET_COLUMN, diagnosis)
+    return frame
@@ -0,0 +1,212 @@
+import threading
+
+import numpy as np
+
+from patient_table import CATEGORICAL_COLUMNS, NUMERIC_COLUMNS
+from scoring import RULES, apply_rules, rank_treatments, rule_hits, rules_reading
+
+# Institutional upper limit of normal for total bilirubin, mg/dL
+BILIRUBIN_ULN = 1.0
+
+# Lab eligibility criteria from caner-treatment-param.txt:
+# name -> (patient column, comparison, threshold)
+CRITERIA = {
+    "anc": ("anc", np.greater, 1500),
+    "platelets": ("platelets", np.greater, 100000),
+    "bilirubin": ("bilirubin", np.less, 1.5 * BILIRUBIN_ULN),
+    "creatinine_clearance": ("creatinine_clearance", np.greater, 60),
+}
+
+# Criteria a treatment requires; treatments not listed require all of them
+TREATMENT_CRITERIA = {}
+
+
+class EligibilityIndex:
+    """Eligibility bitmaps and treatment scores for every row of a `PatientTable`.
+
+    One boolean mask per criterion in `CRITERIA`, the penalty rules each row
+    triggers and a (rows, treatments) score matrix are kept next to the table.
+    `update` recomputes only the rows whose table version changed since the
+    last update, and `refresh` only the criteria and rules that read the
+    fields changed in one row, so queries such as
+    "stage III patients eligible for chemotherapy" or "top 10 patients by
+    immunotherapy score" combine precomputed arrays instead of scoring every
+    patient. Queries cover the rows present at the last `update`.
+
+    Args:
+        table (PatientTable): The patient records.
+        edge_weights (callable): Called as ``edge_weights(rows, treatments)``
+            and returns the (len(rows), len(treatments)) patient-treatment
+            edge weights used for scoring.
+        criteria (dict): Criteria to index, like `CRITERIA`.
+        treatment_criteria (dict): Criteria per treatment, like `TREATMENT_CRITERIA`.
+    """
+
+    def __init__(self, table, edge_weights, criteria=CRITERIA, treatment_criteria=TREATMENT_CRITERIA):
+        self.table = table
+        self.edge_weights = edge_weights
+        self.criteria = criteria
+        self.treatment_criteria = treatment_criteria
+        self.treatments = []
+        self.size = 0
+        self._lock = threading.Lock()
+        self._versions = np.zeros(0, dtype=table.versions.dtype)
+        self._masks = {name: np.zeros(0, dtype=bool) for name in criteria}
+        self._hits = np.zeros((0, len(RULES)), dtype=bool)
+        self._weights = np.zeros((0, 0))
+        self._scores = np.zeros((0, 0))
+
+    def update(self, treatments):
+        """Re-evaluate the rows added or changed since the last update.
+
+        A different list of `treatments` rescores every row.
+
+        Returns:
+            int: Number of rows re-evaluated.
+        """
+        with self._lock:
+            treatments = list(treatments)
+            size = len(self.table)
+            if treatments != self.treatments:
+                self.treatments = treatments
+                self._weights = np.zeros((len(self._versions), len(treatments)))
+                self._scores = np.zeros((len(self._versions), len(treatments)))
+                self._versions[:] = 0
+            if len(self._versions) < size:
+                self._grow(self.table.capacity)
+            self.size = size
+            stale = np.flatnonzero(self.table.versions[:size] != self._versions[:size])
+            if len(stale) == 0:
+                return 0
+
+            # Snapshot the versions before reading the columns. The table
+            # bumps a version only after writing the columns, so a write
+            # racing with the update either is in the snapshot and in the
+            # values read, or leaves the row stale for the next update
+            self._versions[stale] = self.table.versions[stale]
+            columns = self.table.columns
+            for name, (column, compare, threshold) in self.criteria.items():
+                self._masks[name][stale] = compare(columns[column][stale], threshold)
+            self._hits[stale] = rule_hits(self.table.features(stale))
+            if treatments:
+                self._weights[stale] = self.edge_weights(stale, treatments)
+                self._scores[stale] = apply_rules(self._hits[stale], self._weights[stale], treatments)
+            return len(stale)
+
+    def refresh(self, row, fields, versions):
+        """Re-evaluate only the criteria and rules of `row` that read the changed `fields`.
+
+        Used right after a write that changed only `fields` of the row, with
+        the edge weights unchanged. If the index had missed an earlier change
+        to the row, nothing is done and the next `update` re-evaluates it in
+        full.
+
+        Args:
+            row (int): Table row that was written.
+            fields (iterable): Patient fields the write changed.
+            versions (tuple): Row version (before, after) the write.
+
+        Returns:
+            list: Names of the rules re-evaluated, or None if the row was left
+            to `update`.
+        """
+        before, after = versions
+        fields = set(fields)
+        with self._lock:
+            if row >= self.size or self._versions[row] != before:
+                return None
+            columns = self.table.columns
+            for name, (column, compare, threshold) in self.criteria.items():
+                if column in fields:
+                    self._masks[name][row] = compare(columns[column][row], threshold)
+            rules = rules_reading(fields)
+            if rules:
+                self._hits[row, rules] = rule_hits(self.table.features([row]), rules)[0]
+                self._scores[row] = apply_rules(self._hits[[row]], self._weights[[row]], self.treatments)[0]
+            self._versions[row] = after
+            return [RULES[i][0] for i in rules]
+
+    def _grow(self, capacity):
+        versions = np.zeros(capacity, dtype=self._versions.dtype)
+        versions[:len(self._versions)] = self._versions
+        self._versions = versions
+        for name, mask in self._masks.items():
+            grown = np.zeros(capacity, dtype=bool)
+            grown[:len(mask)] = mask
+            self._masks[name] = grown
+        hits = np.zeros((capacity, len(RULES)), dtype=bool)
+        hits[:len(self._hits)] = self._hits
+        self._hits = hits
+        for name in ("_weights", "_scores"):
+            grown = np.zeros((capacity, len(self.treatments)))
+            grown[:len(getattr(self, name))] = getattr(self, name)
+            setattr(self, name, grown)
+
+    def eligible(self, treatment) -> np.ndarray:
+        """Boolean mask over the table rows of the patients meeting every criterion `treatment` requires."""
+        mask = np.ones(self.size, dtype=bool)
+        for name in self.treatment_criteria.get(treatment, self.criteria):
+            mask &= self._masks[name][:self.size]
+        return mask
+
+    def matching(self, **filters) -> np.ndarray:
+        """Boolean mask of the rows whose fields equal the given values, e.g. ``cancer_stage="III"``."""
+        mask = np.ones(self.size, dtype=bool)
+        for name, value in filters.items():
+            if name in CATEGORICAL_COLUMNS:
+                mask &= self.table.equals(name, value, slice(0, self.size))
+            elif name in NUMERIC_COLUMNS:
+                mask &= self.table.columns[name][:self.size] == value
+            else:
+                raise KeyError(f"Cannot filter on patient field: {name}")
+        return mask
+
+    def query(self, treatment=None, **filters) -> np.ndarray:
+        """Rows matching `filters` and, if `treatment` is given, eligible for it."""
+        mask = self.matching(**filters)
+        if treatment is not None:
+            mask &= self.eligible(treatment)
+        return np.flatnonzero(mask)
+
+    def recommendations(self, row):
+        """Ranked (treatment, score) pairs of one row, like `scoring.rank_treatments`."""
+        return rank_treatments(self._scores[row], self.treatments)
+
+    def scores(self, treatment, rows=None) -> np.ndarray:
+        """Indexed scores of `treatment` for `rows` (default all rows)."""
+        column = self._scores[:self.size, self.treatments.index(treatment)]
+        return column if rows is None else column[rows]
+
+    def top_k(self, treatment, k, eligible_only=True, **filters):
+        """The `k` best-scoring rows for `treatment`, best first.
+
+        Args:
+            treatment (str): Treatment to rank by.
+            k (int): Number of rows to return.
+            eligible_only (bool): Only rank patients eligible for `treatment`.
+            **filters: Field values the patients must have, see `matching`.
+
+        Returns:
+            tuple: (rows, scores) arrays of length at most `k`.
+
+        Raises:
+            ValueError: If `treatment` was not in the last `update`.
+        """
+        if k <= 0:
+            return np.zeros(0, dtype=np.intp), np.zeros(0)
+        mask = self.matching(**filters)
+        if eligible_only:
+            mask &= self.eligible(treatment)
+        rows = np.flatnonzero(mask)
+        scores = self.scores(treatment, rows)
+        if k < len(rows):
+            # Keep everything above the k-th best score, then fill up with
+            # the earliest rows tied with it
+            kth = -np.partition(-scores, k - 1)[k - 1]
+            above = np.flatnonzero(scores > kth)
+            tied = np.flatnonzero(scores == kth)[:k - len(above)]
+            best = np.sort(np.concatenate([above, tied]))
+            rows, scores = rows[best], scores[best]
+        # Ties are ranked in row (insertion) order
+        order = np.argsort(-scores, kind="stable")
+        return rows[order], scores[order]
@@ -0,0 +1,232 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# SQLite file holding the patient graph; an empty value disables persistence
+STORE_PATH = os.environ.get("GRAPH_STORE_PATH", "graph_store.sqlite3")
+
+# Buffered writes are committed once this many are pending ...
+BATCH_SIZE = 1000
+
+# ... or once the oldest pending write is this many seconds old
+FLUSH_INTERVAL = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    type TEXT,
+    attrs TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS edges (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    attrs TEXT NOT NULL,
+    UNIQUE (source, target)
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+class GraphStore:
+    """Write-behind SQLite store for the nodes and edges of a graph.
+
+    Writes are buffered in memory and committed in a single transaction per
+    batch, either when `batch_size` writes are pending, when `flush_interval`
+    seconds have passed since the first pending write, or on an explicit
+    `flush`. Writes still buffered when the process dies are lost, so callers
+    should `close` the store on shutdown.
+
+    Nodes and edges are stored with their attributes as JSON. Re-adding a node
+    or edge replaces its attributes, like `networkx.Graph.add_node` does;
+    `update_node` merges some attributes into the stored ones instead.
+
+    Several processes may open the same file: every write of a row gives it a
+    new, increasing sequence number so a process can fetch what the others
+    added or changed with `changes_since`, and `allocate` hands out unique
+    counter values.
+    """
+
+    def __init__(self, path, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._nodes = []
+        self._updates = []
+        self._edges = []
+        self._first_pending = None
+        self._stop = threading.Event()
+        self._flusher = None
+        self._data_version = None
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def add_node(self, node, type, attrs):
+        self._write(self._nodes, (node, type, attrs))
+
+    def update_node(self, node, attrs):
+        """Merge `attrs` into the stored attributes of `node`.
+
+        Only the given attributes are written; the merge happens in the
+        commit transaction, so concurrent updates of different attributes by
+        several processes are all kept. Updates are applied after the
+        `add_node` writes of the same batch.
+        """
+        self._write(self._updates, (node, attrs))
+
+    def add_edge(self, source, target, attrs):
+        self._write(self._edges, (source, target, attrs))
+
+    def _write(self, pending, row):
+        with self._lock:
+            pending.append(row)
+            if self._first_pending is None:
+                self._first_pending = time.monotonic()
+            if len(self._nodes) + len(self._updates) + len(self._edges) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self):
+        """Commit every pending write."""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._nodes and not self._updates and not self._edges:
+            return
+        encode = json.JSONEncoder().encode
+        nodes = [(node, type, encode(attrs)) for node, type, attrs in self._nodes]
+        with self._conn:
+            # IMMEDIATE takes the write lock up front, so the attributes read
+            # for `update_node` cannot change before they are written back
+            self._conn.execute("BEGIN IMMEDIATE")
+            # REPLACE deletes the old row and inserts a new one, so a rewritten
+            # node or edge gets a new sequence number and `changes_since`
+            # returns it again
+            self._conn.executemany("INSERT OR REPLACE INTO nodes (id, type, attrs) VALUES (?, ?, ?)", nodes)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO edges (source, target, attrs) VALUES (?, ?, ?)",
+                _encode_edges(self._edges, encode),
+            )
+            self._merge_updates(encode)
+        self._nodes, self._updates, self._edges = [], [], []
+        self._first_pending = None
+
+    def _merge_updates(self, encode):
+        decode = json.JSONDecoder().decode
+        for node, attrs in self._updates:
+            row = self._conn.execute("SELECT type, attrs FROM nodes WHERE id = ?", (node,)).fetchone()
+            if row is None:
+                continue
+            type, stored = row
+            self._conn.execute(
+                "INSERT OR REPLACE INTO nodes (id, type, attrs) VALUES (?, ?, ?)",
+                (node, type, encode({**decode(stored), **attrs})),
+            )
+
+    def start(self):
+        """Commit pending writes from a background thread every `flush_interval` seconds."""
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._flush_periodically, name="graph-store-flush", daemon=True)
+            self._flusher.start()
+
+    def _flush_periodically(self):
+        while not self._stop.wait(self.flush_interval / 2):
+            with self._lock:
+                if self._first_pending is not None and time.monotonic() - self._first_pending >= self.flush_interval:
+                    self._flush_locked()
+
+    def changes_since(self, node_seq=0, edge_seq=0):
+        """Nodes and edges added or rewritten after the given sequence numbers, in commit order.
+
+        Returns:
+            tuple: ``(nodes, edges, node_seq, edge_seq)`` with nodes as
+            ``(id, attrs)`` pairs (the type is in attrs), edges as
+            ``(source, target, attrs)`` and the sequence numbers to pass to
+            the next call.
+        """
+        decode = json.JSONDecoder().decode
+        # One read transaction, so edges never arrive before their nodes
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            node_rows = self._conn.execute(
+                "SELECT seq, id, type, attrs FROM nodes WHERE seq > ? ORDER BY seq", (node_seq,)
+            ).fetchall()
+            edge_rows = self._conn.execute(
+                "SELECT seq, source, target, attrs FROM edges WHERE seq > ? ORDER BY seq", (edge_seq,)
+            ).fetchall()
+        nodes = [(node, {**decode(attrs), "type": type}) for _, node, type, attrs in node_rows]
+
+        # Decode each distinct edge attribute string once; networkx copies the
+        # dict per edge
+        decoded = {}
+        edges = [
+            (source, target, decoded[attrs] if attrs in decoded else decoded.setdefault(attrs, decode(attrs)))
+            for _, source, target, attrs in edge_rows
+        ]
+        node_seq = node_rows[-1][0] if node_rows else node_seq
+        edge_seq = edge_rows[-1][0] if edge_rows else edge_seq
+        return nodes, edges, node_seq, edge_seq
+
+    def changed(self):
+        """Whether another connection committed since the last call (always True on the first)."""
+        with self._lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        changed, self._data_version = version != self._data_version, version
+        return changed
+
+    def allocate(self, name, n=1, start=0):
+        """Reserve `n` consecutive values of counter `name` and return the first.
+
+        The counter is created at `start` if missing, or raised to `start` if
+        lower, so the first value handed out is ``start + 1``. The update is a
+        single statement, so values are unique across processes.
+        """
+        with self._lock:
+            value = self._conn.execute(
+                "INSERT INTO counters (name, value) VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = max(value, ?) + ? RETURNING value",
+                (name, start + n, start, n),
+            ).fetchone()[0]
+        return value - n + 1
+
+    def close(self):
+        """Stop the background flusher, commit pending writes and close the database."""
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        self.flush()
+        self._conn.close()
+
+
+def _encode_edges(edges, encode):
+    # Edge attributes repeat heavily (e.g. the default patient edges), so
+    # encode each distinct set of hashable attributes once
+    encoded = {}
+    for source, target, attrs in edges:
+        try:
+            key = tuple(attrs.items())
+            text = encoded[key] if key in encoded else encoded.setdefault(key, encode(attrs))
+        except TypeError:
+            text = encode(attrs)
+        yield source, target, text
+
+
+def open_store(path=None):
+    """Open the graph store at `path` (default `STORE_PATH`), or return None if persistence is disabled."""
+    path = STORE_PATH if path is None else path
+    if not path:
+        return None
+    return GraphStore(path)
@@ -1,8 +1,8 @@
 import networkx as nx
-import matplotlib.pyplot as plt
-import torch
-from torch import nn
-from torch_geometric.data import Data
+import numpy as np
+
+import metrics
+from scoring import patient_features, rank_treatments, score_matrix
 
 # Create the graph with detailed health metrics
 def create_graph():
@@ -62,6 +62,8 @@ def create_graph():
 
 # Visualize the graph
 def visualize_graph(G):
+    import matplotlib.pyplot as plt
+
     pos = nx.spring_layout(G)
     node_colors = []
     for node, data in G.nodes(data=True):
@@ -79,9 +81,90 @@ def visualize_graph(G):
     )
     plt.show()
 
+# Export the graph as a sparse adjacency matrix
+def to_csr(G, weight="weight"):
+    """Export a graph as a CSR adjacency matrix (symmetric for undirected graphs).
+
+    Args:
+        G (nx.Graph): The patient-treatment-parameter graph.
+        weight (str): Edge attribute holding the weight; edges without it count as 1.
+
+    Returns:
+        tuple: (nodes, adjacency) with the node names in row order and a
+        `scipy.sparse.csr_array` of shape (len(nodes), len(nodes)).
+    """
+    from scipy import sparse
+
+    # The adjacency of an undirected graph lists every edge from both ends,
+    # which is exactly the CSR layout of the symmetric matrix
+    nodes = list(G)
+    index = {node: i for i, node in enumerate(nodes)}
+    degrees = np.fromiter((len(neighbors) for _, neighbors in G.adjacency()), dtype=np.int64, count=len(nodes))
+    indptr = np.concatenate([[0], np.cumsum(degrees)])
+    indices = np.fromiter(
+        (index[neighbor] for _, neighbors in G.adjacency() for neighbor in neighbors), dtype=np.int64, count=indptr[-1]
+    )
+    weights = np.fromiter(
+        (attrs.get(weight, 1.0) for _, neighbors in G.adjacency() for attrs in neighbors.values()),
+        dtype=float, count=indptr[-1],
+    )
+    adjacency = sparse.csr_array((weights, indices, indptr), shape=(len(nodes), len(nodes)))
+    return nodes, adjacency
+
+# Export the graph as a PyTorch Geometric style edge list
+def to_edge_index(G, weight="weight"):
+    """Export the graph as a (2, E) `edge_index` array listing both directions of each undirected edge.
+
+    Returns:
+        tuple: (nodes, edge_index, edge_weight) as NumPy arrays.
+    """
+    nodes, adjacency = to_csr(G, weight)
+    coo = adjacency.tocoo()
+    return nodes, np.vstack([coo.row, coo.col]).astype(np.int64), coo.data
+
+def to_torch_geometric(G, weight="weight"):
+    """Build a `torch_geometric.data.Data` graph; needs torch and torch_geometric installed."""
+    import torch
+    from torch_geometric.data import Data
+
+    nodes, edge_index, edge_weight = to_edge_index(G, weight)
+    data = Data(edge_index=torch.from_numpy(edge_index), edge_weight=torch.from_numpy(edge_weight),
+                num_nodes=len(nodes))
+    data.node_names = nodes
+    return data
+
+# Score all patient-treatment pairs from the sparse adjacency matrix
+def score_graph(G, nodes=None, adjacency=None):
+    """Score every patient against every treatment at once.
+
+    The patient-treatment edge weights are sliced out of the CSR adjacency
+    matrix instead of being looked up one edge at a time. Pass a previous
+    `to_csr` result as `nodes` and `adjacency` to reuse it.
+
+    Returns:
+        tuple: (patients, treatments, scores) with scores of shape (P, T).
+    """
+    with metrics.phase("score_graph", "load"):
+        if adjacency is None:
+            nodes, adjacency = to_csr(G)
+        types = np.array([G.nodes[node].get("type") for node in nodes], dtype=object)
+        patient_rows = np.flatnonzero(types == "patient")
+        treatment_cols = np.flatnonzero(types == "treatment")
+        patients = [nodes[i] for i in patient_rows]
+        treatments = [nodes[j] for j in treatment_cols]
+        edge_weights = adjacency[patient_rows][:, treatment_cols].toarray()
+        features = patient_features(G.nodes[patient] for patient in patients)
+
+    with metrics.phase("score_graph", "score"):
+        scores = score_matrix(features, edge_weights, treatments)
+    return patients, treatments, scores
+
 # Compare treatments considering detailed health metrics
 def compare_treatments(G):
-    for patient in [node for node, data in G.nodes(data=True) if data.get("type") == "patient"]:
+    # Score every patient-treatment pair at once with the shared penalty rules
+    patients, treatments, scores = score_graph(G)
+
+    for patient, patient_scores in zip(patients, scores):
         print(f"\nPatient: {patient}")
         patient_data = G.nodes[patient]
 
@@ -99,45 +182,27 @@ def compare_treatments(G):
         cancer_stage = patient_data.get("cancer_stage")
         comorbidities = patient_data.get("comorbidities")
         mental_health = patient_data.get("mental_health")
-        weight_loss = patient_data.get("weight_loss")
-        nutritional_status = patient_data.get("nutritional_status")
 
         print(f"  Age: {age}, Sex: {sex}, Performance Status: {performance_status}")
         print(f"  ANC: {anc}, Platelets: {platelets}, Bilirubin: {bilirubin}")
         print(f"  AST: {ast}, ALT: {alt}, Creatinine: {creatinine}, Creatinine Clearance: {creatinine_clearance}")
         print(f"  Cancer Stage: {cancer_stage}, Comorbidities: {comorbidities}, Mental Health: {mental_health}")
 
-        treatment_scores = []
-        for treatment in [node for node, data in G.nodes(data=True) if data.get("type") == "treatment"]:
-            effectiveness = G.edges.get((patient, treatment), {}).get("weight", 0)
-
-            # Adjust effectiveness based on patient metrics
-            if anc < 1500 or platelets < 100000:
-                effectiveness -= 0.3  # Low blood counts reduce tolerance for most treatments
-            if bilirubin > 1.5 or (ast > 40 and alt > 40):
-                effectiveness -= 0.2  # Impaired liver function limits many treatments
-            if creatinine_clearance < 60:
-                effectiveness -= 0.3  # Reduced kidney function limits treatment options
-            if performance_status > 2:
-                effectiveness -= 0.4  # Poor performance status affects all treatments
-            if "diabetes" in comorbidities and treatment == "chemotherapy":
-                effectiveness -= 0.2  # Chemotherapy risk for diabetic patients
-            if weight_loss or nutritional_status == "poor":
-                effectiveness -= 0.3  # Weakened patients handle aggressive treatments poorly
-
-            treatment_scores.append((treatment, max(effectiveness, 0)))  # No negative scores
-
         # Rank and recommend treatments
-        treatment_scores.sort(key=lambda x: x[1], reverse=True)
+        treatment_scores = rank_treatments(patient_scores, treatments)
         for treatment, score in treatment_scores:
             print(f"  Treatment: {treatment}, Score: {score:.2f}")
         best_treatment = treatment_scores[0][0] if treatment_scores else None
         print(f"  Recommended Treatment: {best_treatment}" if best_treatment else "  No suitable treatment found")
 
 # Main function
-if __name__ == "__main__":
+def main():
     G = create_graph()
     visualize_graph(G)
 
     # Compare treatments for all patients
     compare_treatments(G)
+
+
+if __name__ == "__main__":
+    main()
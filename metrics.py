@@ -0,0 +1,186 @@
+import bisect
+import functools
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Record per-phase timings in the simulators; off unless PHASE_TIMERS is set
+PHASE_TIMERS = os.environ.get("PHASE_TIMERS", "") not in ("", "0")
+
+
+class Metric:
+    """A named metric family with one value per combination of label values."""
+
+    type = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}  # label values -> value
+
+    def _key(self, labels):
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def samples(self):
+        """Yield ``(suffix, labels, value)`` for every sample of the family."""
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield "", dict(zip(self.labels, key)), value
+
+
+class Gauge(Metric):
+    """Gauge whose samples are read from `function` at scrape time.
+
+    `function` returns a number, or a dict of label value tuples -> number.
+    """
+
+    type = "gauge"
+
+    def __init__(self, name, help, function, labels=()):
+        super().__init__(name, help, labels)
+        self.function = function
+
+    def samples(self):
+        values = self.function()
+        if values is None:
+            return
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in values.items():
+            yield "", dict(zip(self.labels, key)), value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        # Bucket counts are kept per bucket and summed up when rendered
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[i] += 1
+            counts[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = [(key, list(counts)) for key, counts in self._values.items()]
+        for key, counts in values:
+            labels = dict(zip(self.labels, key))
+            total = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                total += count
+                yield "_bucket", {**labels, "le": _format_value(bound)}, total
+            yield "_sum", labels, counts[-1]
+            yield "_count", labels, total
+
+
+class Registry:
+    """Metric families of one process, rendered in the Prometheus text format.
+
+    Metrics live in the memory of the process that records them; with several
+    server workers each one serves its own.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def gauge(self, name, help, function, labels=()):
+        return self._register(Gauge(name, help, function, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape(metric.help, quotes=False)}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for suffix, labels, value in metric.samples():
+                label_text = ",".join(f'{name}="{_escape(str(v))}"' for name, v in labels.items())
+                label_text = "{" + label_text + "}" if label_text else ""
+                lines.append(f"{metric.name}{suffix}{label_text} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(text, quotes=True):
+    text = text.replace("\\", "\\\\").replace("\n", "\\n")
+    return text.replace('"', '\\"') if quotes else text
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, bool):
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# Default registry, served by the backend at /metrics
+REGISTRY = Registry()
+
+PHASE_SECONDS = REGISTRY.histogram(
+    "simulation_phase_seconds", "Wall time of simulation phases, recorded when PHASE_TIMERS is on.",
+    ("function", "phase"),
+)
+
+
+@contextmanager
+def phase(function, name):
+    """Time one phase (load, simulate, score, serialize) of a simulation function.
+
+    Does nothing unless `PHASE_TIMERS` is true, so the timers can stay in hot
+    code paths.
+    """
+    if not PHASE_TIMERS:
+        yield
+        return
+    with PHASE_SECONDS.time(function=function, phase=name):
+        yield
+
+
+def timed(name):
+    """Decorator recording each call of a function as phase `name`, see `phase`."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not PHASE_TIMERS:
+                return function(*args, **kwargs)
+            with PHASE_SECONDS.time(function=function.__name__, phase=name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from dataset import DIAGNOSIS_CODES, TARGET_COLUMN, load_dataset
+
+# Directory where fitted models are cached, one file per training-data/hyperparameter hash
+CACHE_DIR = os.environ.get("MODEL_CACHE_DIR", ".model_cache")
+
+# Hyperparameters used by app.py and treat.py
+DEFAULT_PARAMS = {"n_estimators": 100, "random_state": 42}
+
+# Dataset and split used for the diagnosis model served by the API
+DATA_PATH = "data.csv"
+TEST_SIZE = 0.2
+SPLIT_SEED = 42
+
+
+@dataclass
+class ModelArtifact:
+    """A fitted classifier with the label encoder and feature order it was trained with."""
+    model: object
+    label_encoder: object
+    feature_names: List[str]
+    key: str
+
+    def predict(self, samples):
+        """Predict decoded labels for a batch of samples.
+
+        Args:
+            samples: DataFrame with the training columns, list of dicts keyed by
+                feature name, or a 2-D array in `feature_names` order.
+
+        Returns:
+            np.ndarray: One decoded label per sample.
+        """
+        if isinstance(samples, pd.DataFrame):
+            X = samples[self.feature_names].to_numpy()
+        elif len(samples) and isinstance(samples[0], dict):
+            X = np.array([[sample[name] for name in self.feature_names] for sample in samples], dtype=float)
+        else:
+            X = np.asarray(samples, dtype=float).reshape(-1, len(self.feature_names))
+        return self.label_encoder.inverse_transform(self.model.predict(X))
+
+
+_memory_cache = {}
+_lock = threading.Lock()
+_diagnosis_model = None
+
+
+def model_key(X, y, params):
+    """Hash the training data, hyperparameters and scikit-learn version."""
+    import sklearn
+
+    digest = hashlib.sha256()
+    if isinstance(X, pd.DataFrame):
+        digest.update(json.dumps(list(map(str, X.columns))).encode())
+        digest.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    else:
+        X = np.ascontiguousarray(X)
+        digest.update(f"{X.dtype}{X.shape}".encode())
+        digest.update(X.tobytes())
+    y = np.asarray(y)
+    digest.update(y.astype(str).tobytes() if y.dtype == object else y.tobytes())
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    digest.update(sklearn.__version__.encode())
+    return digest.hexdigest()
+
+
+def load_or_train(X, y, params=None, cache_dir=CACHE_DIR):
+    """Return a fitted RandomForest for (X, y, params), training it only on a cache miss.
+
+    Artifacts are kept in memory for the life of the process and on disk under
+    `cache_dir`, so a new worker loads the fitted model instead of retraining.
+    """
+    import joblib
+
+    params = dict(DEFAULT_PARAMS if params is None else params)
+    key = model_key(X, y, params)
+    with _lock:
+        if key in _memory_cache:
+            return _memory_cache[key]
+
+        path = os.path.join(cache_dir, f"random_forest-{key[:16]}.joblib")
+        if os.path.exists(path):
+            artifact = joblib.load(path)
+        else:
+            artifact = _train(X, y, params, key)
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            joblib.dump(artifact, tmp_path)
+            os.replace(tmp_path, path)
+        _memory_cache[key] = artifact
+        return artifact
+
+
+def _train(X, y, params, key):
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import LabelEncoder
+
+    label_encoder = LabelEncoder()
+    y = label_encoder.fit_transform(y)
+    model = RandomForestClassifier(**params)
+    # Fit on a plain array; column order is kept in feature_names instead
+    model.fit(np.asarray(X, dtype=float), y)
+    feature_names = list(map(str, X.columns)) if isinstance(X, pd.DataFrame) else [str(i) for i in range(np.shape(X)[1])]
+    return ModelArtifact(model, label_encoder, feature_names, key)
+
+
+def load_diagnosis_data(file_path=DATA_PATH):
+    """Load data.csv and return the train/test split used for the diagnosis model."""
+    from sklearn.model_selection import train_test_split
+
+    data = load_dataset(file_path)
+    X = data.drop(columns=[TARGET_COLUMN])
+    y = data[TARGET_COLUMN].map({code: label for label, code in DIAGNOSIS_CODES.items()})
+    return train_test_split(X, y, test_size=TEST_SIZE, random_state=SPLIT_SEED)
+
+
+def get_diagnosis_model():
+    """Return the M/B diagnosis model, loading or training it on first use."""
+    global _diagnosis_model
+    if _diagnosis_model is None:
+        X_train, X_test, y_train, y_test = load_diagnosis_data()
+        _diagnosis_model = load_or_train(X_train, y_train, DEFAULT_PARAMS)
+    return _diagnosis_model
+
+
+def predict_diagnosis(samples):
+    """Predict 'M' or 'B' for a batch of samples with the cached diagnosis model."""
+    return get_diagnosis_model().predict(samples)
@@ -0,0 +1,195 @@
+import numpy as np
+
+import drug_simulate
+import metrics
+import simulate1
+import tumor_simulation
+
+# Two-sided 95% normal quantile used for the confidence band of the mean
+Z_95 = 1.959963984540054
+
+
+def _doxorubicin(params, time_steps):
+    concentration, tumor_size, health_score = drug_simulate.simulate_doxorubicin_batch(time_steps=time_steps, **params)
+    return {"concentration": concentration, "tumor_size": tumor_size, "health_score": health_score}
+
+
+def _tumor_growth(params, time_steps):
+    tumor_size = tumor_simulation.simulate_tumor_growth_batch(
+        params.get("growth_rate", tumor_simulation.base_growth_rate),
+        params.get("max_size", tumor_simulation.max_tumor_size),
+        params.get("therapy_effect", 0.0),
+        initial_size=params.get("initial_size"),
+        steps=time_steps,
+    )
+    return {"tumor_size": tumor_size}
+
+
+def _patient_response(params, time_steps):
+    time, tumor_sizes, drug_concentrations, health_scores = simulate1.simulate_cohort_response(
+        params.get("initial_tumor_size", 100.0),
+        params.get("drug_dosage", 50.0),
+        time_steps,
+        params.get("health_score", 70.0),
+        params.get("toxicity_threshold", 40.0),
+    )
+    return {"tumor_size": tumor_sizes, "concentration": drug_concentrations, "health_score": health_scores}
+
+
+# name -> (block simulator(params, time_steps) returning {output: (block, time_steps)}, default time_steps)
+MODELS = {
+    "doxorubicin": (_doxorubicin, drug_simulate.time_steps),
+    "tumor_growth": (_tumor_growth, tumor_simulation.time_steps),
+    "patient_response": (_patient_response, 180),
+}
+
+
+def sample_parameter(spec, rng, size):
+    """Draw `size` values for one parameter.
+
+    `spec` is a constant, a callable ``spec(rng, size)``, or a tuple naming a
+    distribution: ``("normal", mean, sd)``, ``("lognormal", median, sigma)``,
+    ``("uniform", low, high)`` or ``("triangular", low, mode, high)``.
+    """
+    if callable(spec):
+        return np.asarray(spec(rng, size), dtype=float)
+    if not isinstance(spec, tuple):
+        return np.full(size, spec, dtype=float)
+    kind, *args = spec
+    if kind == "normal":
+        return rng.normal(args[0], args[1], size)
+    if kind == "lognormal":
+        return args[0] * np.exp(rng.normal(0.0, args[1], size))
+    if kind == "uniform":
+        return rng.uniform(args[0], args[1], size)
+    if kind == "triangular":
+        return rng.triangular(args[0], args[1], args[2], size)
+    raise ValueError(f"Unknown distribution: {kind}")
+
+
+class StreamingStats:
+    """Running mean, variance and histogram-based quantiles per time step.
+
+    Blocks of shape (replicates, time_steps) are merged as they arrive, so only
+    O(time_steps * bins) memory is kept regardless of the number of replicates.
+    Histogram ranges are set per time step from the first block, widened by
+    `margin`; later values outside that range are counted in the edge bins, and
+    `clipped` reports how many were.
+    """
+
+    def __init__(self, time_steps, bins=512, margin=0.5):
+        self.count = 0
+        self.mean = np.zeros(time_steps)
+        self.m2 = np.zeros(time_steps)
+        self.bins = bins
+        self.margin = margin
+        self.low = self.high = None
+        self.histogram = np.zeros((time_steps, bins), dtype=np.int64)
+        self.clipped = 0
+
+    def update(self, block):
+        block = np.asarray(block, dtype=float)
+        n = len(block)
+        if n == 0:
+            return
+
+        # Chan et al. parallel update of mean and sum of squared deviations
+        block_mean = block.mean(axis=0)
+        block_m2 = ((block - block_mean) ** 2).sum(axis=0)
+        total = self.count + n
+        delta = block_mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += block_m2 + delta ** 2 * self.count * n / total
+        self.count = total
+
+        if self.low is None:
+            low, high = block.min(axis=0), block.max(axis=0)
+            pad = np.maximum((high - low) * self.margin, 1e-12 * np.maximum(1.0, np.abs(high)))
+            self.low, self.high = low - pad, high + pad
+        width = (self.high - self.low) / self.bins
+        index = np.floor((block - self.low) / width).astype(np.int64)
+        outside = (index < 0) | (index >= self.bins)
+        self.clipped += int(outside.sum())
+        np.clip(index, 0, self.bins - 1, out=index)
+        flat = index + np.arange(block.shape[1]) * self.bins
+        self.histogram += np.bincount(flat.ravel(), minlength=self.histogram.size).reshape(self.histogram.shape)
+
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / max(self.count - 1, 1))
+
+    def quantile(self, q):
+        """Approximate quantile per time step, interpolated within histogram bins."""
+        cumulative = np.cumsum(self.histogram, axis=1)
+        target = q * self.count
+        bin_index = np.minimum((cumulative < target).sum(axis=1), self.bins - 1)
+        rows = np.arange(len(cumulative))
+        below = np.where(bin_index > 0, cumulative[rows, np.maximum(bin_index - 1, 0)], 0)
+        in_bin = np.maximum(self.histogram[rows, bin_index], 1)
+        fraction = np.clip((target - below) / in_bin, 0, 1)
+        width = (self.high - self.low) / self.bins
+        return self.low + (bin_index + fraction) * width
+
+    def summary(self, quantiles):
+        half_width = Z_95 * self.std / np.sqrt(max(self.count, 1))
+        return {
+            "mean": self.mean.copy(),
+            "std": self.std,
+            "mean_ci_low": self.mean - half_width,
+            "mean_ci_high": self.mean + half_width,
+            "quantiles": {q: self.quantile(q) for q in quantiles},
+            "clipped": self.clipped,
+        }
+
+
+def run_monte_carlo(model, parameters, replicates, time_steps=None, block_size=10_000, seed=0,
+                    quantiles=(0.05, 0.5, 0.95), bins=512, progress=None):
+    """Run a simulator with sampled parameters and reduce the replicates online.
+
+    Replicates are simulated in vectorized blocks of `block_size`. Each block
+    draws from its own stream spawned from `seed`, so results are reproducible
+    for a given seed and block size. Only the running statistics are kept, never
+    the full (replicates, time_steps) trajectories.
+
+    Args:
+        model (str): One of `MODELS`: "doxorubicin" (e.g. elimination_rate,
+            therapeutic_effect_rate, side_effect_rate), "tumor_growth"
+            (growth_rate, max_size, therapy_effect) or "patient_response"
+            (initial_tumor_size, drug_dosage, health_score, toxicity_threshold).
+        parameters (dict): Parameter name -> constant or distribution spec
+            accepted by `sample_parameter`.
+        replicates (int): Total number of replicates.
+        time_steps (int, optional): Horizon; defaults to the model's own.
+        block_size (int): Replicates simulated per vectorized block.
+        seed (int): Seed for the random streams.
+        quantiles (tuple): Quantiles to report per time step.
+        bins (int): Histogram bins per time step used for the quantiles.
+        progress (callable, optional): Called as ``progress(done, total)`` with
+            the number of replicates simulated after each block.
+
+    Returns:
+        dict: Output name -> summary with per-step "mean", "std", a 95%
+        confidence band for the mean, "quantiles" and the "clipped" count.
+    """
+    simulate, default_steps = MODELS[model]
+    time_steps = default_steps if time_steps is None else time_steps
+    n_blocks = -(-replicates // block_size)
+    streams = np.random.SeedSequence(seed).spawn(n_blocks)
+    stats = {}
+    for b, stream in enumerate(streams):
+        size = min(block_size, replicates - b * block_size)
+        rng = np.random.default_rng(stream)
+        with metrics.phase("run_monte_carlo", "sample"):
+            sampled = {name: sample_parameter(spec, rng, size) for name, spec in parameters.items()}
+        with metrics.phase("run_monte_carlo", "simulate"):
+            outputs = simulate(sampled, time_steps)
+        with metrics.phase("run_monte_carlo", "reduce"):
+            for name, block in outputs.items():
+                block = np.broadcast_to(block, (size, time_steps))
+                if name not in stats:
+                    stats[name] = StreamingStats(time_steps, bins)
+                stats[name].update(block)
+        if progress is not None:
+            progress(b * block_size + size, replicates)
+    with metrics.phase("run_monte_carlo", "serialize"):
+        return {name: s.summary(quantiles) for name, s in stats.items()}
@@ -0,0 +1,225 @@
+import numpy as np
+
+from scoring import FEATURES
+
+# Patient fields by storage kind, in the order of `backend.PatientRequest`
+FIELDS = (
+    "age", "sex", "prior_treatments", "concurrent_malignancies", "performance_status", "anc", "platelets",
+    "bilirubin", "ast", "alt", "creatinine", "creatinine_clearance", "cancer_type", "cancer_stage",
+    "comorbidities", "weight_loss", "nutritional_status", "mental_health", "tumor_marker",
+)
+NUMERIC_COLUMNS = {
+    "age": np.int32,
+    "performance_status": np.int32,
+    "anc": np.int32,
+    "platelets": np.int32,
+    "bilirubin": np.float64,
+    "ast": np.int32,
+    "alt": np.int32,
+    "creatinine": np.float64,
+    "creatinine_clearance": np.int32,
+    "concurrent_malignancies": np.bool_,
+    "weight_loss": np.bool_,
+}
+# Free-text fields stored as int32 codes into a per-column vocabulary; -1 is None
+CATEGORICAL_COLUMNS = (
+    "sex", "prior_treatments", "cancer_type", "cancer_stage", "nutritional_status", "mental_health", "tumor_marker",
+)
+# List fields stored as a bitset over a vocabulary, 64 values per uint64 word
+SET_COLUMNS = ("comorbidities",)
+
+# Range of the int32 columns; callers validate values against it before writing
+INT32_MIN, INT32_MAX = int(np.iinfo(np.int32).min), int(np.iinfo(np.int32).max)
+
+# Rows allocated up front; capacity doubles when full
+INITIAL_CAPACITY = 1024
+
+
+class PatientTable:
+    """Columnar store of patient records.
+
+    Each field is a typed NumPy column indexed by row: numbers and flags as
+    plain arrays, free-text fields as codes into a vocabulary, and list fields
+    such as comorbidities as bitsets. A patient costs about a hundred bytes
+    instead of a dict of Python objects, and `features` builds the scoring
+    feature matrix for many rows with array indexing.
+
+    `versions` counts the writes to each row, so callers can tell whether
+    results derived from a row are stale. It is bumped after the columns are
+    written, so a reader that sees a version also sees that write's values.
+    `touch` bumps it for changes kept outside the table, such as graph edges.
+
+    The table is not locked; callers that append from several threads must
+    serialize the writes.
+    """
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self.size = 0
+        self.columns = {name: np.zeros(capacity, dtype=dtype) for name, dtype in NUMERIC_COLUMNS.items()}
+        self.columns.update({name: np.full(capacity, -1, dtype=np.int32) for name in CATEGORICAL_COLUMNS})
+        self.columns.update({name: np.zeros((capacity, 1), dtype=np.uint64) for name in SET_COLUMNS})
+        self.vocabularies = {name: {} for name in CATEGORICAL_COLUMNS + SET_COLUMNS}  # value -> code
+        self._values = {name: [] for name in CATEGORICAL_COLUMNS + SET_COLUMNS}  # code -> value
+        self.versions = np.zeros(capacity, dtype=np.uint32)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def capacity(self):
+        return len(self.columns["age"])
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values()) + self.versions.nbytes
+
+    def append(self, patient: dict) -> int:
+        """Add a patient record and return its row."""
+        if self.size == self.capacity:
+            self._grow(2 * self.capacity)
+        row = self.size
+        # Write the row before counting it, so a value that does not fit its
+        # column leaves the table as it was
+        try:
+            self.set(row, patient)
+        except Exception:
+            self._clear(slice(row, row + 1))
+            raise
+        self.size += 1
+        return row
+
+    def extend(self, patients) -> range:
+        """Add many patient records, filling each column in one pass, and return their rows."""
+        patients = list(patients)
+        start, end = self.size, self.size + len(patients)
+        capacity = self.capacity
+        while capacity < end:
+            capacity *= 2
+        if capacity > self.capacity:
+            self._grow(capacity)
+        names = {name for patient in patients for name in patient}
+        try:
+            for name in names:
+                values = [patient.get(name) for patient in patients]
+                if name in NUMERIC_COLUMNS:
+                    self.columns[name][start:end] = values
+                elif name in CATEGORICAL_COLUMNS:
+                    self.columns[name][start:end] = [-1 if value is None else self._code(name, value) for value in values]
+                elif name in SET_COLUMNS:
+                    for row, value in enumerate(values, start):
+                        self._set_bits(name, row, value)
+                else:
+                    raise KeyError(f"Unknown patient field: {name}")
+        except Exception:
+            self._clear(slice(start, end))
+            raise
+        self.versions[start:end] += 1
+        self.size = end
+        return range(start, end)
+
+    def set(self, row: int, patient: dict):
+        """Overwrite the fields of `row` that are present in `patient`."""
+        for name, value in patient.items():
+            if name in NUMERIC_COLUMNS:
+                self.columns[name][row] = value
+            elif name in CATEGORICAL_COLUMNS:
+                self.columns[name][row] = -1 if value is None else self._code(name, value)
+            elif name in SET_COLUMNS:
+                self._set_bits(name, row, value)
+            else:
+                raise KeyError(f"Unknown patient field: {name}")
+        self.versions[row] += 1
+
+    def touch(self, row: int):
+        self.versions[row] += 1
+
+    def get(self, row: int) -> dict:
+        """Rebuild the patient record of `row` as a dict of Python values.
+
+        List fields come back in the order their values were first seen by the
+        table, not necessarily the order they were given in.
+        """
+        if not 0 <= row < self.size:
+            raise IndexError(row)
+        patient = {}
+        for name in FIELDS:
+            column = self.columns[name]
+            if name in NUMERIC_COLUMNS:
+                patient[name] = column[row].item()
+            elif name in CATEGORICAL_COLUMNS:
+                patient[name] = None if column[row] < 0 else self._values[name][column[row]]
+            else:
+                patient[name] = [value for code, value in enumerate(self._values[name]) if self._has(name, row, code)]
+        return patient
+
+    def has(self, name: str, value, rows=None) -> np.ndarray:
+        """Boolean mask of the rows whose set column `name` contains `value`."""
+        rows = slice(0, self.size) if rows is None else rows
+        code = self.vocabularies[name].get(value)
+        if code is None:
+            return np.zeros(len(self.columns[name][rows]), dtype=bool)
+        word = self.columns[name][rows, code // 64]
+        return (word >> np.uint64(code % 64)) & np.uint64(1) == 1
+
+    def equals(self, name: str, value, rows=None) -> np.ndarray:
+        """Boolean mask of the rows whose categorical column `name` equals `value`."""
+        rows = slice(0, self.size) if rows is None else rows
+        code = self.vocabularies[name].get(value)
+        if code is None:
+            return np.zeros(len(self.columns[name][rows]), dtype=bool)
+        return self.columns[name][rows] == code
+
+    def features(self, rows=None) -> np.ndarray:
+        """Build the (len(rows), len(FEATURES)) scoring feature matrix, like `scoring.patient_features`."""
+        rows = np.arange(self.size) if rows is None else np.asarray(rows, dtype=np.intp)
+        derived = {
+            "diabetes": lambda: self.has("comorbidities", "diabetes", rows),
+            "poor_nutrition": lambda: self.equals("nutritional_status", "poor", rows),
+        }
+        features = np.empty((len(rows), len(FEATURES)))
+        for j, name in enumerate(FEATURES):
+            features[:, j] = derived[name]() if name in derived else self.columns[name][rows]
+        return features
+
+    def _code(self, name, value):
+        vocabulary = self.vocabularies[name]
+        code = vocabulary.get(value)
+        if code is None:
+            code = vocabulary[value] = len(self._values[name])
+            self._values[name].append(value)
+        return code
+
+    def _set_bits(self, name, row, values):
+        codes = [self._code(name, value) for value in values or ()]
+        words = max(codes, default=-1) // 64 + 1
+        if words > self.columns[name].shape[1]:
+            self._widen(name, words)
+        bits = self.columns[name][row]
+        bits[:] = 0
+        for code in codes:
+            bits[code // 64] |= np.uint64(1) << np.uint64(code % 64)
+
+    def _has(self, name, row, code):
+        return bool((int(self.columns[name][row, code // 64]) >> (code % 64)) & 1)
+
+    def _clear(self, rows):
+        # Reset rows past `size` to their initial values after a failed write
+        for name, column in self.columns.items():
+            column[rows] = -1 if name in CATEGORICAL_COLUMNS else 0
+
+    def _grow(self, capacity):
+        for name, column in self.columns.items():
+            grown = np.zeros((capacity,) + column.shape[1:], dtype=column.dtype)
+            if name in CATEGORICAL_COLUMNS:
+                grown[:] = -1
+            grown[:len(column)] = column
+            self.columns[name] = grown
+        versions = np.zeros(capacity, dtype=self.versions.dtype)
+        versions[:len(self.versions)] = self.versions
+        self.versions = versions
+
+    def _widen(self, name, words):
+        column = self.columns[name]
+        widened = np.zeros((len(column), words), dtype=np.uint64)
+        widened[:, :column.shape[1]] = column
+        self.columns[name] = widened
@@ -0,0 +1,80 @@
+import numpy as np
+
+# Values tracked for every regimen, in output order
+TRACKED = ("tumor_size", "wbc_count", "creatinine")
+
+# Initial patient parameters
+INITIAL_VALUES = {
+    "tumor_size": 5.0,  # cm
+    "wbc_count": 5000,  # cells/mm³
+    "creatinine": 1.0,  # mg/dL
+}
+
+# Daily change in each tracked value while a therapy is active
+THERAPY_RATES = {
+    # Chemotherapy decreases tumor size, suppresses immune system, impacts kidneys
+    "chemotherapy": {"tumor_size": -0.05, "wbc_count": -50, "creatinine": 0.005},
+    # Immunotherapy boosts immune system, gradually decreases tumor size
+    "immunotherapy": {"tumor_size": -0.02, "wbc_count": 60, "creatinine": 0.002},
+    # Radiation targets tumor directly, affects immune function and kidneys
+    "radiation": {"tumor_size": -0.07, "wbc_count": -20, "creatinine": 0.003},
+}
+
+
+def simulate_regimens(regimens, days=90, initial_values=None, therapy_rates=None):
+    """Simulate tumor size, WBC count and creatinine for many regimens at once.
+
+    A regimen is a sequence of phases ``(therapy, start_day, stop_day)``; days
+    are numbered from 1 and both ends are inclusive, and a `stop_day` of None
+    runs to the end of the simulation. Phases may overlap, in which case the
+    daily effects of the active therapies add up. A therapy listed in
+    overlapping phases of the same regimen only counts once per day. Each value
+    changes linearly with the number of days each therapy has been active, so
+    ``[("chemotherapy", 1, None)]`` reproduces the single-therapy model.
+
+    Args:
+        regimens (list): R regimens, each a list of phases.
+        days (int): Number of days to simulate.
+        initial_values (dict, optional): Initial value per tracked name, scalar
+            or shape (R,). Missing names default to `INITIAL_VALUES`.
+        therapy_rates (dict, optional): Daily effects per therapy. Defaults to
+            `THERAPY_RATES`.
+
+    Returns:
+        dict: ``"day"`` of shape (days,) and one (R, days) array per `TRACKED` name.
+    """
+    therapy_rates = THERAPY_RATES if therapy_rates is None else therapy_rates
+    initial_values = dict(INITIAL_VALUES, **(initial_values or {}))
+    therapies = list(therapy_rates)
+    therapy_index = {therapy: i for i, therapy in enumerate(therapies)}
+    rates = np.array([[therapy_rates[t].get(name, 0.0) for name in TRACKED] for t in therapies], dtype=float)
+
+    # Mark phase boundaries in a difference array, then integrate twice:
+    # once for "active on day d", once for "days active up to day d".
+    regimen_ids, therapy_ids, starts, stops = [], [], [], []
+    for r, regimen in enumerate(regimens):
+        for therapy, start_day, stop_day in regimen:
+            if therapy not in therapy_index:
+                raise ValueError(f"Unknown therapy: {therapy}")
+            start = min(max(int(start_day), 1), days + 1)
+            stop = days if stop_day is None else min(int(stop_day), days)
+            if stop < start:
+                continue
+            regimen_ids.append(r)
+            therapy_ids.append(therapy_index[therapy])
+            starts.append(start - 1)
+            stops.append(stop)
+
+    boundaries = np.zeros((len(regimens), len(therapies), days + 1), dtype=np.int32)
+    np.add.at(boundaries, (regimen_ids, therapy_ids, starts), 1)
+    np.add.at(boundaries, (regimen_ids, therapy_ids, stops), -1)
+    active = np.minimum(np.cumsum(boundaries[:, :, :days], axis=2), 1)
+    active_days = np.cumsum(active, axis=2, dtype=float)
+
+    values = np.empty((len(TRACKED), len(regimens), days))
+    np.einsum("rtd,tk->krd", active_days, rates, out=values)
+    results = {"day": np.arange(1, days + 1)}
+    for k, name in enumerate(TRACKED):
+        values[k] += np.asarray(initial_values[name], dtype=float).reshape(-1, 1)
+        results[name] = values[k]
+    return results
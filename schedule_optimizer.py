@@ -0,0 +1,167 @@
+import numpy as np
+
+import drug_simulate
+import metrics
+
+# Score added per health point below the constraint, large enough that any
+# feasible schedule beats any infeasible one
+HEALTH_PENALTY = 1e3
+
+
+def build_schedules(doses, intervals, time_steps, cycle_scales=None):
+    """Build (P, time_steps) dose schedules for P candidates.
+
+    Candidate p gets ``doses[p]`` every ``intervals[p]`` time steps (not days), optionally
+    scaled per cycle by ``cycle_scales[p, cycle]``. As in the model, nothing is
+    given at step 0, so the first cycle starts at step ``intervals[p]``.
+    """
+    doses = np.asarray(doses, dtype=float)
+    intervals = np.asarray(intervals, dtype=np.int64)
+    steps = np.arange(time_steps)
+    dosing = (steps % intervals[:, None] == 0) & (steps > 0)
+    schedules = np.where(dosing, doses[:, None], 0.0)
+    if cycle_scales is not None:
+        cycle = np.minimum(steps // intervals[:, None] - 1, cycle_scales.shape[1] - 1)
+        schedules *= np.take_along_axis(cycle_scales, np.maximum(cycle, 0), axis=1)
+    return schedules
+
+
+def evaluate_schedules(schedules, **model_params):
+    """Final tumor size and health score for each (P, time_steps) schedule."""
+    concentration, tumor_size, health_score = drug_simulate.simulate_doxorubicin_batch(
+        time_steps=schedules.shape[1], schedule=schedules, trajectories=False, **model_params
+    )
+    return tumor_size, health_score
+
+
+def final_values(doses, intervals, time_steps, cycle_scales=None, dt=drug_simulate.dt,
+                 elimination_rate=drug_simulate.elimination_rate,
+                 therapeutic_effect_rate=drug_simulate.therapeutic_effect_rate,
+                 side_effect_rate=drug_simulate.side_effect_rate, toxicity_threshold=drug_simulate.toxicity_threshold,
+                 initial_tumor_size=drug_simulate.initial_tumor_size,
+                 initial_health_score=drug_simulate.initial_health_score):
+    """Final tumor size and health score of the schedules `build_schedules` would build.
+
+    Solves the model segment by segment between doses like
+    `drug_simulate.solve_doxorubicin`, for all P candidates at once, so the
+    cost grows with the number of doses rather than with `time_steps`. The
+    values match `evaluate_schedules` up to floating point rounding. The model
+    parameters are scalars shared by all candidates.
+    """
+    doses = np.asarray(doses, dtype=float)
+    intervals = np.asarray(intervals, dtype=np.int64)
+    # Candidate p is dosed at steps k * intervals[p] for k = 1, 2, ... below time_steps
+    n_doses = (time_steps - 1) // intervals
+    k = np.arange(1, n_doses.max(initial=0) + 1)
+    starts = intervals[:, None] * k
+    given = np.broadcast_to(doses[:, None], starts.shape)
+    if cycle_scales is not None:
+        given = given * cycle_scales[:, np.minimum(k - 1, cycle_scales.shape[1] - 1)]
+
+    # Concentration right after each dose: what is left of the previous ones plus the new one
+    decay = elimination_rate * dt
+    carry = np.exp(-decay * intervals)
+    levels = np.empty(starts.shape)
+    level = np.zeros(len(doses))
+    for j in range(len(k)):
+        level = level * carry + given[:, j]
+        levels[:, j] = level
+
+    dosed = k <= n_doses[:, None]
+    lengths = np.minimum(intervals[:, None], time_steps - starts)
+    total, excess = drug_simulate._segment_sums(levels[dosed], lengths[dosed], decay, toxicity_threshold)
+    candidate = np.broadcast_to(np.arange(len(doses))[:, None], starts.shape)[dosed]
+    total = np.bincount(candidate, weights=total, minlength=len(doses))
+    excess = np.bincount(candidate, weights=excess, minlength=len(doses))
+    tumor_size = np.maximum(0, initial_tumor_size - therapeutic_effect_rate * dt * total)
+    health_score = np.maximum(0, initial_health_score + side_effect_rate * dt * excess)
+    return tumor_size, health_score
+
+
+def optimize_schedule(min_health=50, dose_bounds=(10, 120), interval_bounds=(7, 42), per_cycle=False,
+                      cycle_scale_bounds=(0.0, 1.5), time_steps=drug_simulate.time_steps, population=256,
+                      iterations=30, elite_fraction=0.1, seed=0, progress=None, **model_params):
+    """Search dose and interval that minimize final tumor size under a health constraint.
+
+    Uses the cross-entropy method: each iteration samples a population of
+    candidate schedules from independent normal distributions, scores the
+    whole population at once with `final_values`, and refits the
+    distributions to the best `elite_fraction`. Schedules that end with a
+    health score below `min_health` are penalized by `HEALTH_PENALTY` per
+    missing point.
+
+    Args:
+        min_health (float): Minimum acceptable final health score.
+        dose_bounds (tuple): Range of the dose per administration in mg/m².
+        interval_bounds (tuple): Range of days between administrations.
+        per_cycle (bool): Also optimize a dose multiplier for each cycle.
+        cycle_scale_bounds (tuple): Range of the per-cycle multipliers.
+        time_steps (int): Simulation horizon in steps of `dt` days (in days
+            with the default dt of 1).
+        population (int): Candidates scored per iteration.
+        iterations (int): Number of refits.
+        elite_fraction (float): Share of candidates used to refit.
+        seed (int): Seed for the sampler.
+        progress (callable, optional): Called as ``progress(done, total)`` after
+            each iteration.
+        **model_params: Patient-specific scalar parameters of the model passed
+            to `final_values`, e.g. dt, elimination_rate or initial_tumor_size.
+
+    Raises:
+        ValueError: If `model_params` sets the dosing (dose, dose_interval or
+            schedule), which is what is optimized.
+
+    Returns:
+        dict: Best "dose", "interval", "cycle_scales" (or None), "schedule",
+        "final_tumor_size", "final_health_score" and whether it is "feasible".
+    """
+    fixed = sorted(set(model_params) & {"dose", "dose_interval", "schedule", "trajectories"})
+    if fixed:
+        raise ValueError(f"optimize_schedule chooses the dosing itself; remove {', '.join(fixed)}")
+    rng = np.random.default_rng(seed)
+    # Intervals are searched in days and converted to steps of `dt` days,
+    # like `simulate_doxorubicin_batch` does for `dose_interval`
+    dt = model_params.get("dt", drug_simulate.dt)
+    n_cycles = -(-time_steps // drug_simulate._dose_interval_steps(interval_bounds[0], dt))
+    low = np.array([dose_bounds[0], interval_bounds[0]] + [cycle_scale_bounds[0]] * (n_cycles if per_cycle else 0))
+    high = np.array([dose_bounds[1], interval_bounds[1]] + [cycle_scale_bounds[1]] * (n_cycles if per_cycle else 0))
+    mean = (low + high) / 2
+    std = (high - low) / 2
+    # Per-cycle multipliers start around the plain fixed-dose schedule
+    mean[2:] = np.clip(1.0, low[2:], high[2:])
+    std[2:] /= 4
+    n_elite = max(2, int(population * elite_fraction))
+    best = None
+
+    for iteration in range(iterations):
+        candidates = np.clip(rng.normal(mean, std, (population, len(mean))), low, high)
+        candidates[:, 1] = np.round(candidates[:, 1])
+        interval_steps = np.maximum(1, np.round(candidates[:, 1] / dt)).astype(np.int64)
+        with metrics.phase("optimize_schedule", "simulate"):
+            tumor_size, health_score = final_values(candidates[:, 0], interval_steps, time_steps,
+                                                    candidates[:, 2:] if per_cycle else None, **model_params)
+        with metrics.phase("optimize_schedule", "score"):
+            score = tumor_size + HEALTH_PENALTY * np.maximum(0, min_health - health_score)
+
+            order = np.argsort(score)
+            if best is None or score[order[0]] < best[0]:
+                i = order[0]
+                best = (score[i], candidates[i].copy(), interval_steps[i], tumor_size[i], health_score[i])
+
+            elite = candidates[order[:n_elite]]
+            mean = 0.7 * elite.mean(axis=0) + 0.3 * mean
+            std = 0.7 * elite.std(axis=0) + 0.3 * std
+        if progress is not None:
+            progress(iteration + 1, iterations)
+
+    _, params, interval, tumor_size, health_score = best
+    schedule = build_schedules(params[:1], [interval], time_steps, params[None, 2:] if per_cycle else None)[0]
+    return {
+        "dose": float(params[0]),
+        "interval": int(params[1]),
+        "cycle_scales": params[2:].tolist() if per_cycle else None,
+        "schedule": schedule,
+        "final_tumor_size": float(tumor_size),
+        "final_health_score": float(health_score),
+        "feasible": bool(health_score >= min_health),
+    }
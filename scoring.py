@@ -0,0 +1,141 @@
+import numpy as np
+
+# Patient metrics read by the penalty rules, in feature-matrix column order
+FEATURES = (
+    "anc",
+    "platelets",
+    "bilirubin",
+    "ast",
+    "alt",
+    "creatinine_clearance",
+    "performance_status",
+    "diabetes",
+    "weight_loss",
+    "poor_nutrition",
+)
+_COLUMN = {name: i for i, name in enumerate(FEATURES)}
+
+# Patient fields each feature is computed from
+FEATURE_FIELDS = {
+    "anc": ("anc",),
+    "platelets": ("platelets",),
+    "bilirubin": ("bilirubin",),
+    "ast": ("ast",),
+    "alt": ("alt",),
+    "creatinine_clearance": ("creatinine_clearance",),
+    "performance_status": ("performance_status",),
+    "diabetes": ("comorbidities",),
+    "weight_loss": ("weight_loss",),
+    "poor_nutrition": ("nutritional_status",),
+}
+
+# Penalty rules applied to every patient-treatment pair, in evaluation order:
+# (name, penalty, treatments the rule applies to or None for all, mask over the feature matrix)
+RULES = [
+    # Low blood counts reduce tolerance for most treatments
+    ("blood_counts", 0.3, None,
+     lambda f: (f[:, _COLUMN["anc"]] < 1500) | (f[:, _COLUMN["platelets"]] < 100000)),
+    # Impaired liver function limits many treatments
+    ("liver_function", 0.2, None,
+     lambda f: (f[:, _COLUMN["bilirubin"]] > 1.5) | ((f[:, _COLUMN["ast"]] > 40) & (f[:, _COLUMN["alt"]] > 40))),
+    # Reduced kidney function limits treatment options
+    ("kidney_function", 0.3, None,
+     lambda f: f[:, _COLUMN["creatinine_clearance"]] < 60),
+    # Poor performance status affects all treatments
+    ("performance_status", 0.4, None,
+     lambda f: f[:, _COLUMN["performance_status"]] > 2),
+    # Chemotherapy risk for diabetic patients
+    ("diabetes", 0.2, ("chemotherapy",),
+     lambda f: f[:, _COLUMN["diabetes"]] > 0),
+    # Weakened patients handle aggressive treatments poorly
+    ("nutrition", 0.3, None,
+     lambda f: (f[:, _COLUMN["weight_loss"]] > 0) | (f[:, _COLUMN["poor_nutrition"]] > 0)),
+]
+
+# Features each rule's mask reads; keep in sync with RULES
+RULE_FEATURES = {
+    "blood_counts": ("anc", "platelets"),
+    "liver_function": ("bilirubin", "ast", "alt"),
+    "kidney_function": ("creatinine_clearance",),
+    "performance_status": ("performance_status",),
+    "diabetes": ("diabetes",),
+    "nutrition": ("weight_loss", "poor_nutrition"),
+}
+
+
+def rules_reading(fields):
+    """Indices into `RULES` of the rules whose result depends on any of the patient `fields`."""
+    fields = set(fields)
+    features = {feature for feature, sources in FEATURE_FIELDS.items() if fields.intersection(sources)}
+    return [i for i, (name, *_) in enumerate(RULES) if features.intersection(RULE_FEATURES[name])]
+
+
+def patient_features(patients):
+    """Build the (P, len(FEATURES)) feature matrix from patient attribute dicts."""
+    patients = list(patients)
+    features = np.empty((len(patients), len(FEATURES)))
+    for row, patient in enumerate(patients):
+        features[row] = (
+            patient.get("anc"),
+            patient.get("platelets"),
+            patient.get("bilirubin"),
+            patient.get("ast"),
+            patient.get("alt"),
+            patient.get("creatinine_clearance"),
+            patient.get("performance_status"),
+            "diabetes" in (patient.get("comorbidities") or ()),
+            bool(patient.get("weight_loss")),
+            patient.get("nutritional_status") == "poor",
+        )
+    return features
+
+
+def rule_hits(features, rules=None):
+    """Evaluate penalty rules on a feature matrix.
+
+    Args:
+        features (np.ndarray): Patient features, shape (P, len(FEATURES)).
+        rules (sequence of int, optional): Indices into `RULES`; all by default.
+
+    Returns:
+        np.ndarray: Boolean matrix of shape (P, len(rules)), True where the
+        patient triggers the rule.
+    """
+    rules = range(len(RULES)) if rules is None else rules
+    hits = np.empty((len(features), len(rules)), dtype=bool)
+    for j, i in enumerate(rules):
+        hits[:, j] = RULES[i][3](features)
+    return hits
+
+
+def apply_rules(hits, base_weights, treatments):
+    """Turn edge weights and the (P, len(RULES)) `rule_hits` into scores, like `score_matrix`."""
+    scores = np.array(base_weights, dtype=float, copy=True).reshape(len(hits), len(treatments))
+    for (name, penalty, applies_to, _), hit in zip(RULES, hits.T):
+        if applies_to is None:
+            scores -= penalty * hit[:, None]
+        else:
+            columns = [j for j, treatment in enumerate(treatments) if treatment in applies_to]
+            scores[:, columns] -= penalty * hit[:, None]
+    return np.maximum(scores, 0)
+
+
+def score_matrix(features, base_weights, treatments):
+    """Score every patient-treatment pair at once.
+
+    Args:
+        features (np.ndarray): Patient features, shape (P, len(FEATURES)).
+        base_weights (array-like): Patient-treatment edge weights, shape (P, T).
+        treatments (sequence): Treatment names for the T columns.
+
+    Returns:
+        np.ndarray: Effectiveness scores, shape (P, T), clipped at zero.
+    """
+    return apply_rules(rule_hits(features), base_weights, treatments)
+
+
+def rank_treatments(scores, treatments):
+    """Turn one row of scores into (treatment, score) pairs, best first."""
+    treatment_scores = [(treatment, float(score)) for treatment, score in zip(treatments, scores)]
+    treatment_scores.sort(key=lambda x: x[1], reverse=True)
+    return treatment_scores
@@ -1,6 +1,15 @@
+import json
+import os
+
 import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
+
+import metrics
+
+# Default protocol of `simulate_treatment` and the cohort pipeline
+PROTOCOL = {"drug_dosage": 50, "num_days": 180, "health_score": 70, "toxicity_threshold": 40}
+
+# Source rows read per block by the cohort pipeline
+PIPELINE_CHUNK_ROWS = 10_000
 
 # Function to simulate patient response
 def simulate_patient_response(initial_tumor_size, drug_dosage, num_days, health_score, toxicity_threshold):
@@ -52,43 +61,259 @@ def simulate_patient_response(initial_tumor_size, drug_dosage, num_days, health_
 
     return time, tumor_sizes, drug_concentrations, health_scores
 
+# Function to simulate the response of a whole cohort at once
+@metrics.timed("simulate")
+def simulate_cohort_response(initial_tumor_sizes, drug_dosages, num_days, health_scores, toxicity_thresholds):
+    """Simulate tumor size and health score over time for N patients at once.
+
+    Applies the same daily rules as `simulate_patient_response`, but each day is
+    advanced for every patient with NumPy array operations. Scalar arguments are
+    broadcast against the per-patient arrays.
+
+    Args:
+        initial_tumor_sizes (array-like): Initial tumor sizes in cm³, shape (N,).
+        drug_dosages (array-like): Drug dosages administered in mg, shape (N,).
+        num_days (int): Number of days to simulate.
+        health_scores (array-like): Initial health scores, shape (N,).
+        toxicity_thresholds (array-like): Maximum tolerable drug concentrations, shape (N,).
+
+    Returns:
+        tuple: (time, tumor_sizes, drug_concentrations, health_scores) where the
+        last three are arrays of shape (N, num_days).
+    """
+    initial_tumor_sizes, drug_dosages, health_scores, toxicity_thresholds = np.broadcast_arrays(
+        *(np.atleast_1d(np.asarray(a, dtype=float)) for a in (initial_tumor_sizes, drug_dosages, health_scores, toxicity_thresholds))
+    )
+    n_patients = initial_tumor_sizes.shape[0]
+    time = np.arange(0, num_days, 1)
+
+    tumor_sizes = np.empty((n_patients, num_days))
+    drug_concentrations = np.empty((n_patients, num_days))
+    health_out = np.empty((n_patients, num_days))
+
+    tumor_size = initial_tumor_sizes.copy()
+    drug_concentration = np.zeros(n_patients)
+    current_health_score = health_scores.copy()
+
+    for t in time:
+        # Administer drug every 30 days, then apply the daily decay
+        if t % 30 == 0:
+            drug_concentration += drug_dosages
+        np.maximum(drug_concentration - 5, 0, out=drug_concentration)
+
+        # Shrink where the concentration is toxic, grow slightly elsewhere;
+        # toxic days cost 1 + 2 health points as in the scalar model
+        toxic = drug_concentration > toxicity_thresholds
+        tumor_size *= np.where(toxic, 0.9, 1.01)
+        current_health_score -= 3 * toxic
+        np.maximum(current_health_score, 0, out=current_health_score)
+
+        tumor_sizes[:, t] = tumor_size
+        drug_concentrations[:, t] = drug_concentration
+        health_out[:, t] = current_health_score
+
+    return time, tumor_sizes, drug_concentrations, health_out
+
 # Load and preprocess the dataset
 def preprocess_dataset(file_path):
-    """Preprocess the dataset to extract relevant columns and clean data."""
-    data = pd.read_csv(file_path)
-    
-    # Example preprocessing for Breast Cancer dataset
-    # Drop unnecessary columns
-    data = data.drop(columns=['id', 'Unnamed: 32'], errors='ignore')
-    
-    # Encode diagnosis as binary: M=1, B=0
-    data['diagnosis'] = data['diagnosis'].map({'M': 1, 'B': 0})
-    
-    # Fill or drop missing values
-    data = data.dropna()
-    
-    return data
+    """Preprocess the dataset to extract relevant columns and clean data.
+
+    Drops the id and empty columns, encodes diagnosis as M=1 / B=0 and drops
+    rows with missing values. The result comes from `dataset.load_dataset`, which
+    caches it as float32 memory-mapped columns and only re-reads the CSV when it
+    changes, so treat the returned frame as read-only.
+    """
+    from dataset import load_dataset
+
+    return load_dataset(file_path)
 
 # Simulate treatment for a single patient
 def simulate_treatment(row):
     """Simulate treatment for a single patient."""
-    initial_tumor_size = row['radius_mean'] * 10  # Scale tumor size for simulation
-    drug_dosage = 50                              # Fixed drug dosage (mg)
-    num_days = 180                                # Simulate for 180 days
-    health_score = 70                             # Initial health score
-    toxicity_threshold = 40                       # Toxicity threshold
+    # The cached dataset stores features as float32; simulate in float64
+    initial_tumor_size = float(row['radius_mean']) * 10  # Scale tumor size for simulation
 
-    # Run simulation
-    time, tumor_sizes, drug_concentrations, health_scores = simulate_patient_response(
-        initial_tumor_size, drug_dosage, num_days, health_score, toxicity_threshold
-    )
+    # Run simulation with the fixed `PROTOCOL`
+    time, tumor_sizes, drug_concentrations, health_scores = simulate_patient_response(initial_tumor_size, **PROTOCOL)
 
     # Return the final tumor size and health score
     return tumor_sizes[-1], health_scores[-1]
 
+# Simulate treatment for every patient in a dataset
+def simulate_cohort_treatment(data):
+    """Simulate treatment for every row of a preprocessed dataset at once.
+
+    Uses the same fixed `PROTOCOL` as `simulate_treatment`, but runs the whole
+    cohort through `simulate_cohort_response` instead of one row at a time.
+
+    Returns:
+        tuple: (final_tumor_sizes, final_health_scores), arrays of shape (N,).
+    """
+    initial_tumor_sizes = data['radius_mean'].to_numpy(dtype=float) * 10
+    time, tumor_sizes, drug_concentrations, health_scores = simulate_cohort_response(
+        initial_tumor_sizes, drug_dosages=PROTOCOL["drug_dosage"], num_days=PROTOCOL["num_days"],
+        health_scores=PROTOCOL["health_score"], toxicity_thresholds=PROTOCOL["toxicity_threshold"],
+    )
+    return tumor_sizes[:, -1], health_scores[:, -1]
+
+# Stream a whole cohort from CSV to result files on disk
+def run_cohort_pipeline(file_path, output_dir, chunk_rows=PIPELINE_CHUNK_ROWS, trajectory_stride=None,
+                        progress=None, **protocol):
+    """Simulate every patient in a CSV in blocks and append the results to disk.
+
+    Rows are read `chunk_rows` at a time, cleaned like `preprocess_dataset`, and
+    simulated with `simulate_cohort_response` using ``radius_mean * 10`` as the
+    initial tumor size. Each block is appended to raw column files in
+    `output_dir` (see `load_cohort_results`), after which `checkpoint.json` is
+    atomically replaced. If the run stops, calling it again with the same
+    arguments truncates any partly written block and resumes after the last
+    checkpointed one.
+
+    Args:
+        file_path (str): Source CSV with `id`, `diagnosis` and `radius_mean` columns.
+        output_dir (str): Directory for the result columns and the checkpoint.
+        chunk_rows (int): Source rows per block.
+        trajectory_stride (int, optional): Also store tumor size, concentration
+            and health score every `trajectory_stride` days as float32.
+        progress (callable, optional): Called as ``progress(source_rows, rows)``
+            after each block with the source rows read and results written so far.
+        **protocol: Overrides for `PROTOCOL` (drug_dosage, num_days,
+            health_score, toxicity_threshold).
+
+    Returns:
+        int: Number of patients in the results.
+    """
+    from dataset import source_signature
+
+    protocol = {**PROTOCOL, **protocol}
+    settings = {"source": os.path.abspath(file_path), "source_signature": source_signature(os.path.abspath(file_path)),
+                "chunk_rows": chunk_rows, "trajectory_stride": trajectory_stride, "protocol": protocol}
+    checkpoint = _read_checkpoint(output_dir)
+    if checkpoint is not None and checkpoint["settings"] != settings:
+        raise ValueError(f"{output_dir} holds results of a different run; use a new directory or delete it.")
+    if checkpoint is not None and checkpoint["complete"]:
+        return checkpoint["rows"]
+    source_rows, rows = (checkpoint["source_rows"], checkpoint["rows"]) if checkpoint else (0, 0)
+
+    os.makedirs(output_dir, exist_ok=True)
+    columns = _pipeline_columns(trajectory_stride, protocol["num_days"])
+    files = {name: _open_truncated(os.path.join(output_dir, name + extension), rows * itemsize)
+             for name, (extension, itemsize) in columns.items()}
+    try:
+        blocks = _read_patient_blocks(file_path, chunk_rows, source_rows)
+        while True:
+            with metrics.phase("run_cohort_pipeline", "load"):
+                block = next(blocks, None)
+            if block is None:
+                break
+            block_rows, ids, radius_mean = block
+            with metrics.phase("run_cohort_pipeline", "simulate"):
+                results = _simulate_block(ids, radius_mean, protocol, trajectory_stride)
+            with metrics.phase("run_cohort_pipeline", "serialize"):
+                for name, values in results.items():
+                    files[name].write(values.tobytes())
+                for f in files.values():
+                    f.flush()
+                    os.fsync(f.fileno())
+                source_rows += block_rows
+                rows += len(ids)
+                _write_checkpoint(output_dir, settings, source_rows, rows, complete=False)
+            if progress is not None:
+                progress(source_rows, rows)
+    finally:
+        for f in files.values():
+            f.close()
+    _write_checkpoint(output_dir, settings, source_rows, rows, complete=True)
+    return rows
+
+# Open the results of a cohort pipeline run
+def load_cohort_results(output_dir):
+    """Memory-map the results written by `run_cohort_pipeline`.
+
+    Returns:
+        dict: "id" (int64), "final_tumor_size" and "final_health_score"
+        (float64), and with trajectories "trajectory_days" plus float32
+        (N, len(trajectory_days)) arrays "tumor_size", "drug_concentration" and
+        "health_score". Only checkpointed rows are included.
+    """
+    checkpoint = _read_checkpoint(output_dir)
+    if checkpoint is None:
+        raise FileNotFoundError(f"No cohort results in {output_dir}")
+    rows = checkpoint["rows"]
+    stride = checkpoint["settings"]["trajectory_stride"]
+    num_days = checkpoint["settings"]["protocol"]["num_days"]
+    results = {}
+    for name, (extension, itemsize) in _pipeline_columns(stride, num_days).items():
+        dtype = {".i8": np.int64, ".f8": np.float64, ".f4": np.float32}[extension]
+        shape = (rows, itemsize // np.dtype(dtype).itemsize)
+        path = os.path.join(output_dir, name + extension)
+        values = np.memmap(path, dtype=dtype, mode="r", shape=shape) if rows else np.empty(shape, dtype)
+        results[name] = values if stride and name in _TRAJECTORY_COLUMNS else values[:, 0]
+    if stride:
+        results["trajectory_days"] = np.arange(0, num_days, stride)
+    return results
+
+_TRAJECTORY_COLUMNS = ("tumor_size", "drug_concentration", "health_score")
+
+def _pipeline_columns(trajectory_stride, num_days):
+    """Result column name -> (file extension, bytes per patient)."""
+    columns = {"id": (".i8", 8), "final_tumor_size": (".f8", 8), "final_health_score": (".f8", 8)}
+    if trajectory_stride:
+        samples = len(range(0, num_days, trajectory_stride))
+        columns.update({name: (".f4", 4 * samples) for name in _TRAJECTORY_COLUMNS})
+    return columns
+
+def _read_patient_blocks(file_path, chunk_rows, skip_rows):
+    """Yield (source rows, ids, radius_mean) blocks, dropping rows `preprocess_dataset` drops."""
+    import pandas as pd
+    from dataset import DIAGNOSIS_CODES, DROPPED_COLUMNS, TARGET_COLUMN
+
+    reader = pd.read_csv(file_path, usecols=lambda c: c not in DROPPED_COLUMNS, chunksize=chunk_rows,
+                         skiprows=range(1, skip_rows + 1), dtype={"radius_mean": np.float32})
+    for chunk in reader:
+        source_rows = len(chunk)
+        chunk[TARGET_COLUMN] = chunk[TARGET_COLUMN].map(DIAGNOSIS_CODES)
+        chunk = chunk.dropna()
+        yield source_rows, chunk["id"].to_numpy(np.int64), chunk["radius_mean"].to_numpy(np.float32)
+
+def _simulate_block(ids, radius_mean, protocol, trajectory_stride):
+    time, tumor_sizes, drug_concentrations, health_scores = simulate_cohort_response(
+        radius_mean.astype(float) * 10, protocol["drug_dosage"], protocol["num_days"], protocol["health_score"],
+        protocol["toxicity_threshold"],
+    )
+    results = {"id": ids, "final_tumor_size": tumor_sizes[:, -1], "final_health_score": health_scores[:, -1]}
+    if trajectory_stride:
+        for name, values in zip(_TRAJECTORY_COLUMNS, (tumor_sizes, drug_concentrations, health_scores)):
+            results[name] = np.ascontiguousarray(values[:, ::trajectory_stride], dtype=np.float32)
+    return results
+
+def _open_truncated(path, size):
+    # Drop whatever a crashed run appended after the last checkpoint
+    f = open(path, "r+b" if os.path.exists(path) else "w+b")
+    f.truncate(size)
+    f.seek(size)
+    return f
+
+def _read_checkpoint(output_dir):
+    try:
+        with open(os.path.join(output_dir, "checkpoint.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _write_checkpoint(output_dir, settings, source_rows, rows, complete):
+    path = os.path.join(output_dir, "checkpoint.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump({"settings": settings, "source_rows": source_rows, "rows": rows, "complete": complete}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
 # Visualize simulation results
 def plot_simulation(time, tumor_sizes, drug_concentrations, health_scores):
     """Plot simulation results."""
+    import matplotlib.pyplot as plt
+
     plt.figure(figsize=(12, 8))
 
     # Plot tumor sizes
@@ -120,7 +345,7 @@ def plot_simulation(time, tumor_sizes, drug_concentrations, health_scores):
     plt.show()
 
 # Main code
-if __name__ == "__main__":
+def main():
     # Load dataset (ensure file path is correct)
     file_path = "data.csv"  # Replace with your dataset path
     data = preprocess_dataset(file_path)
@@ -137,12 +362,13 @@ if __name__ == "__main__":
     
     # Simulate patient response
     time, tumor_sizes, drug_concentrations, health_scores = simulate_patient_response(
-        initial_tumor_size=random_patient['radius_mean'] * 10,
-        drug_dosage=50,
-        num_days=180,
-        health_score=70,
-        toxicity_threshold=40
+        initial_tumor_size=float(random_patient['radius_mean']) * 10,
+        **PROTOCOL
     )
 
     # Plot the results
     plot_simulation(time, tumor_sizes, drug_concentrations, health_scores)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,478 @@
+import json
+import multiprocessing
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Windows: every process runs its own jobs
+    fcntl = None
+
+import numpy as np
+
+import metrics
+
+# SQLite file holding the jobs shared by the server workers
+JOBS_PATH = os.environ.get("SIMULATION_JOBS_PATH", "simulation_jobs.sqlite3")
+
+# Worker processes running simulations, for the whole host
+WORKERS = int(os.environ.get("SIMULATION_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+
+# Jobs that may be queued or running at once; further submissions are refused
+MAX_ACTIVE_JOBS = int(os.environ.get("SIMULATION_QUEUE_DEPTH", 32))
+
+# Finished jobs kept for status and result lookups, oldest dropped first
+MAX_FINISHED_JOBS = 1000
+
+# Limits on job parameters, checked before a job is queued: the horizon in
+# steps or days, values per output (batch size times horizon), Monte Carlo
+# replicates and optimizer iterations
+MAX_TIME_STEPS = 20_000
+MAX_JOB_VALUES = 5_000_000
+MAX_REPLICATES = 10_000_000
+MAX_ITERATIONS = 1000
+
+# Seconds between progress reports (and cancellation checks) of a running job
+REPORT_INTERVAL = 0.2
+
+
+JOB_SECONDS = metrics.REGISTRY.histogram(
+    "simulation_job_seconds", "Time from submission to completion of simulation jobs.", ("kind", "status"),
+)
+JOB_QUEUE_SECONDS = metrics.REGISTRY.histogram(
+    "simulation_job_queue_seconds", "Time simulation jobs waited for a worker.", ("kind",),
+)
+
+
+class QueueFull(Exception):
+    """Raised by `JobQueue.submit` when `MAX_ACTIVE_JOBS` jobs are pending."""
+
+
+class JobCancelled(Exception):
+    """Raised inside a worker when its job was cancelled while running."""
+
+
+# Job kinds. Each runner takes the job parameters and a ``progress(done, total)``
+# callback, and returns a dict of arrays or numbers.
+def _run_doxorubicin(params, progress):
+    import drug_simulate
+
+    concentration, tumor_size, health_score = drug_simulate.simulate_doxorubicin_batch(progress=progress, **params)
+    return {"concentration": concentration, "tumor_size": tumor_size, "health_score": health_score}
+
+
+def _run_tumor_growth(params, progress):
+    import tumor_simulation
+
+    tumor_size = tumor_simulation.simulate_tumor_growth_batch(
+        params.get("growth_rate", tumor_simulation.base_growth_rate),
+        params.get("max_size", tumor_simulation.max_tumor_size),
+        params.get("therapy_effect", 0.0),
+        initial_size=params.get("initial_size"),
+        steps=params.get("steps"),
+        progress=progress,
+    )
+    return {"tumor_size": tumor_size}
+
+
+def _run_regimen(params, progress):
+    import regimen
+
+    result = regimen.simulate_regimens(params["regimens"], days=params.get("days", 90))
+    progress(1, 1)
+    return result
+
+
+def _run_schedule_optimizer(params, progress):
+    import schedule_optimizer
+
+    return schedule_optimizer.optimize_schedule(progress=progress, **params)
+
+
+def _run_monte_carlo(params, progress):
+    import monte_carlo
+
+    parameters = {name: tuple(spec) if isinstance(spec, list) else spec
+                  for name, spec in params.get("parameters", {}).items()}
+    options = {key: value for key, value in params.items() if key not in ("model", "parameters")}
+    return monte_carlo.run_monte_carlo(params["model"], parameters, progress=progress, **options)
+
+
+JOB_KINDS = {
+    "doxorubicin": _run_doxorubicin,
+    "tumor_growth": _run_tumor_growth,
+    "regimen": _run_regimen,
+    "schedule_optimizer": _run_schedule_optimizer,
+    "monte_carlo": _run_monte_carlo,
+}
+
+
+def _batch_size(params, names):
+    # Length of the longest list among the array-valued parameters
+    return max([len(params[name]) for name in names if isinstance(params.get(name), list)] or [1])
+
+
+def check_params(kind, params):
+    """Reject job parameters that would exceed the `MAX_*` limits.
+
+    Raises:
+        ValueError: If a limit is exceeded or a size parameter is not a number.
+    """
+    import drug_simulate
+    import monte_carlo
+    import tumor_simulation
+
+    try:
+        if kind == "doxorubicin":
+            steps = int(params.get("time_steps", drug_simulate.time_steps))
+            batch = _batch_size(params, params)
+        elif kind == "tumor_growth":
+            steps = int(params.get("steps") or tumor_simulation.time_steps)
+            batch = _batch_size(params, ("growth_rate", "max_size", "therapy_effect", "initial_size"))
+        elif kind == "regimen":
+            steps = int(params.get("days", 90))
+            batch = len(params.get("regimens") or ())
+        elif kind == "schedule_optimizer":
+            steps = int(params.get("time_steps", drug_simulate.time_steps))
+            batch = int(params.get("population", 256))
+            if int(params.get("iterations", 30)) > MAX_ITERATIONS:
+                raise ValueError(f"iterations must be at most {MAX_ITERATIONS}")
+        elif kind == "monte_carlo":
+            model = monte_carlo.MODELS.get(params.get("model"))
+            if model is None:
+                raise ValueError(f"Unknown Monte Carlo model: {params.get('model')}")
+            steps = int(model[1] if params.get("time_steps") is None else params["time_steps"])
+            batch = int(params.get("block_size", 10_000))
+            if int(params.get("replicates", 0)) > MAX_REPLICATES:
+                raise ValueError(f"replicates must be at most {MAX_REPLICATES}")
+        else:
+            raise ValueError(f"Unknown simulation kind: {kind}")
+    except TypeError as exc:
+        raise ValueError(f"Invalid {kind} parameters: {exc}") from None
+    if steps < 1:
+        raise ValueError(f"The horizon must be at least 1 step, got {steps}")
+    if steps > MAX_TIME_STEPS:
+        raise ValueError(f"The horizon must be at most {MAX_TIME_STEPS} steps, got {steps}")
+    if batch * steps > MAX_JOB_VALUES:
+        raise ValueError(f"{batch} simulations of {steps} steps exceed the limit of {MAX_JOB_VALUES} values")
+
+
+def to_json(value):
+    """Convert NumPy arrays and scalars, tuples and non-string keys into JSON-ready values."""
+    if isinstance(value, dict):
+        return {str(key): to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json(item) for item in value]
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    return value
+
+
+def _run_job(job_id, kind, params, progress_queue, cancelled):
+    # Runs in a worker process; progress is reported back through the queue.
+    # Simulators may call this every step, so reports are throttled.
+    last_report = time.monotonic()
+
+    def progress(done, total):
+        nonlocal last_report
+        now = time.monotonic()
+        if now - last_report < REPORT_INTERVAL and done < total:
+            return
+        last_report = now
+        if job_id in cancelled:
+            raise JobCancelled(job_id)
+        progress_queue.put((job_id, done, total))
+
+    result = JOB_KINDS[kind](params, progress)
+    if job_id in cancelled:
+        raise JobCancelled(job_id)  # skip converting the result of a cancelled job
+    return to_json(result)
+
+
+class Job:
+    """Snapshot of a job as stored in the job table."""
+
+    def __init__(self, job_id, kind, params, patient_id=None, status="queued", progress=(0, None),
+                 cancel_requested=False, error=None, result=None, created=None):
+        self.id = job_id
+        self.kind = kind
+        self.params = params
+        self.patient_id = patient_id
+        self._status = status
+        self.progress = progress
+        self.cancel_requested = cancel_requested
+        self.error = error
+        self.result = result
+        self.created = time.time() if created is None else created
+
+    @property
+    def status(self):
+        if self._status == "running" and self.cancel_requested:
+            return "cancelling"
+        return self._status
+
+    @property
+    def finished(self):
+        return self._status in FINISHED
+
+    def describe(self):
+        done, total = self.progress
+        status = self.status
+        if status == "done" and total is not None:
+            done = total  # the last progress report may not have been stored
+        info = {"job_id": self.id, "kind": self.kind, "status": status, "progress": {"done": done, "total": total}}
+        if self.patient_id is not None:
+            info["patient_id"] = self.patient_id
+        if status == "failed":
+            info["error"] = self.error
+        return info
+
+
+# Job statuses that are final
+FINISHED = ("done", "failed", "cancelled")
+
+JOB_COLUMNS = "id, kind, params, patient_id, status, done, total, cancel_requested, error, created"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    patient_id TEXT,
+    status TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    total INTEGER,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    result TEXT,
+    created REAL NOT NULL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, created);
+"""
+
+
+class JobQueue:
+    """Bounded queue of simulation jobs shared by the processes of a host.
+
+    Jobs, their progress, results and cancellation requests are kept in the
+    SQLite database at `path`, so every server worker that opens the same
+    file sees and can cancel every job. Only one of those processes runs
+    simulations: the one holding the lock file next to the database starts
+    the process pool of `workers` processes and takes queued jobs from the
+    table as workers become free. If it exits, another process takes over,
+    and jobs it left running are marked failed.
+
+    Progress reports from the pool arrive through a manager queue and are
+    written to the table; running jobs are cancelled at their next progress
+    report.
+    """
+
+    def __init__(self, path=None, workers=WORKERS, max_active=MAX_ACTIVE_JOBS, max_finished=MAX_FINISHED_JOBS):
+        self.path = JOBS_PATH if path is None else path
+        self.workers = workers
+        self.max_active = max_active
+        self.max_finished = max_finished
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._lock_file = None
+        self._executor = None
+        self._running = {}  # job id -> future, of the jobs this process runs
+        self._closed = threading.Event()
+        self._dispatcher = threading.Thread(target=self._dispatch, name="simulation-dispatch", daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, kind, params=None, patient_id=None):
+        """Enqueue a job and return it.
+
+        `patient_id` only labels the job in its description; it does not
+        change the simulation inputs, which all come from `params`.
+
+        Raises:
+            ValueError: If `kind` is not one of `JOB_KINDS`, or `params` fail `check_params`.
+            QueueFull: If `max_active` jobs are already queued or running.
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown simulation kind: {kind}")
+        check_params(kind, params or {})
+        job = Job(uuid.uuid4().hex, kind, params or {}, patient_id)
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            active = self._conn.execute("SELECT count(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+            if active >= self.max_active:
+                raise QueueFull(f"{active} simulations are already queued or running")
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, params, patient_id, status, created) VALUES (?, ?, ?, ?, 'queued', ?)",
+                (job.id, kind, json.dumps(job.params), patient_id, job.created),
+            )
+            # Drop the oldest finished jobs beyond `max_finished`
+            self._conn.execute(
+                "DELETE FROM jobs WHERE id IN (SELECT id FROM jobs WHERE status IN ('done', 'failed', 'cancelled') "
+                "ORDER BY finished DESC LIMIT -1 OFFSET ?)",
+                (self.max_finished,),
+            )
+        return job
+
+    def get(self, job_id, with_result=False):
+        """The job, with its decoded `result` if asked and done, or None if there is no such job."""
+        with self._lock:
+            row = self._conn.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            result = None
+            if row is not None and with_result and row[4] == "done":
+                result = self._conn.execute("SELECT result FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+        if row is None:
+            return None
+        job = _job_from_row(row)
+        if result is not None:
+            job.result = json.loads(result)
+        return job
+
+    def cancel(self, job_id):
+        """Cancel a job; returns the job, or None if there is no such job."""
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id),
+            )
+            # Running jobs are stopped by the process running them
+            self._conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,))
+        return self.get(job_id)
+
+    def counts(self):
+        """Number of known jobs by status, as ``{(status,): count}``."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT CASE WHEN status = 'running' AND cancel_requested THEN 'cancelling' ELSE status END, count(*) "
+                "FROM jobs GROUP BY 1"
+            ).fetchall()
+        return {(status,): count for status, count in rows}
+
+    def _dispatch(self):
+        # Try to become the process running the jobs, then start queued
+        # jobs on free workers and forward cancellation requests
+        while not self._closed.wait(REPORT_INTERVAL / 2):
+            if self._executor is None and not self._acquire_runner():
+                continue
+            with self._lock:
+                cancelled = self._conn.execute(
+                    "SELECT id FROM jobs WHERE status = 'running' AND cancel_requested"
+                ).fetchall()
+            for (job_id,) in cancelled:
+                if job_id in self._running:
+                    self._cancelled[job_id] = True
+            while len(self._running) < self.workers and not self._closed.is_set():
+                with self._lock:
+                    row = self._conn.execute(
+                        "UPDATE jobs SET status = 'running' WHERE id = "
+                        "(SELECT id FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1) "
+                        f"RETURNING {JOB_COLUMNS}"
+                    ).fetchone()
+                if row is None:
+                    break
+                self._start(_job_from_row(row))
+
+    def _acquire_runner(self):
+        if self._lock_file is None:
+            self._lock_file = open(self.path + ".lock", "a")
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return False
+        with self._lock:
+            # Jobs still marked running were left by a previous runner that exited
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'The simulation worker exited', finished = ? "
+                "WHERE status = 'running'",
+                (time.time(),),
+            )
+        context = multiprocessing.get_context("spawn")
+        self._manager = context.Manager()
+        self._progress = self._manager.Queue()
+        self._cancelled = self._manager.dict()
+        self._executor = ProcessPoolExecutor(self.workers, mp_context=context)
+        self._listener = threading.Thread(target=self._drain_progress, name="simulation-progress", daemon=True)
+        self._listener.start()
+        return True
+
+    def _start(self, job):
+        JOB_QUEUE_SECONDS.observe(time.time() - job.created, kind=job.kind)
+        future = self._executor.submit(_run_job, job.id, job.kind, job.params, self._progress, self._cancelled)
+        self._running[job.id] = future
+        future.add_done_callback(lambda future, job=job: self._finish(job, future))
+
+    def _finish(self, job, future):
+        error = None if future.cancelled() else future.exception()
+        result = None
+        if future.cancelled() or isinstance(error, JobCancelled):
+            status, error = "cancelled", None
+        elif error is not None:
+            status, error = "failed", repr(error)
+        else:
+            status, result = "done", json.dumps(future.result())
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, result = ?, finished = ? WHERE id = ?",
+                (status, error, result, time.time(), job.id),
+            )
+        JOB_SECONDS.observe(time.time() - job.created, kind=job.kind, status=status)
+        self._running.pop(job.id, None)
+        self._cancelled.pop(job.id, None)
+
+    def _drain_progress(self):
+        while not self._closed.is_set():
+            try:
+                job_id, done, total = self._progress.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            with self._lock:
+                self._conn.execute(
+                    "UPDATE jobs SET done = ?, total = ? WHERE id = ? AND status = 'running'", (done, total, job_id)
+                )
+
+    def shutdown(self):
+        """Stop running jobs and the worker processes; queued jobs stay queued for another process."""
+        self._closed.set()
+        self._dispatcher.join()
+        if self._executor is not None:
+            for job_id in list(self._running):
+                self._cancelled[job_id] = True
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._listener.join()
+            self._manager.shutdown()
+            self._executor = None
+        if self._lock_file is not None:
+            self._lock_file.close()  # releases the lock
+        self._conn.close()
+
+
+def _job_from_row(row):
+    job_id, kind, params, patient_id, status, done, total, cancel_requested, error, created = row
+    return Job(job_id, kind, json.loads(params), patient_id, status, (done, total), bool(cancel_requested), error,
+               created=created)
+
+
+def watch(jobs, job_id, interval=0.2):
+    """Yield the description of job `job_id` in `jobs` whenever it changes, until the job finishes."""
+    last = None
+    while True:
+        job = jobs.get(job_id)
+        if job is None:
+            return
+        info = job.describe()
+        if info != last:
+            yield info
+            last = info
+        if job.finished:
+            return
+        time.sleep(interval)
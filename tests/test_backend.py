@@ -0,0 +1,71 @@
+import numpy as np
+
+import backend
+from eligibility import EligibilityIndex
+
+
+def test_patch_updates_patient_and_index(client, patient):
+    patient_id = client.post("/add_patient/", json=patient).json()["patient_id"]
+    assert client.get("/patients/eligible", params={"treatment": "chemotherapy"}).json()["patient_ids"] == [patient_id]
+    version = backend.registry.version(patient_id)
+
+    response = client.patch(f"/patients/{patient_id}", json={"anc": 900, "age": patient["age"]}).json()
+    assert response["updated_fields"] == ["anc"]
+    assert response["reevaluated_rules"] is not None
+    assert backend.registry.version(patient_id) > version
+    assert backend.registry.patient(patient_id)["anc"] == 900
+    assert client.get("/patients/eligible", params={"treatment": "chemotherapy"}).json()["patient_ids"] == []
+    cached = client.get(f"/recommend_treatments/{patient_id}").json()["recommended_treatments"]
+    backend.recommendation_cache = backend.RecommendationCache()
+    assert client.get(f"/recommend_treatments/{patient_id}").json()["recommended_treatments"] == cached
+
+
+def test_patch_without_changes_keeps_version(client, patient):
+    patient_id = client.post("/add_patient/", json=patient).json()["patient_id"]
+    version = backend.registry.version(patient_id)
+    response = client.patch(f"/patients/{patient_id}", json={"anc": patient["anc"]}).json()
+    assert response["updated_fields"] == [] and response["reevaluated_rules"] == []
+    assert backend.registry.version(patient_id) == version
+
+
+def test_patch_rejects_invalid_values(client, patient):
+    patient_id = client.post("/add_patient/", json=patient).json()["patient_id"]
+    assert "error" in client.patch(f"/patients/{patient_id}", json={"anc": None}).json()
+    assert "error" in client.patch("/patients/chemotherapy", json={"anc": 1}).json()
+    assert client.patch(f"/patients/{patient_id}", json={"platelets": 3_000_000_000}).status_code == 422
+    assert client.post("/add_patient/", json={**patient, "platelets": 3_000_000_000}).status_code == 422
+    assert backend.registry.patient(patient_id) == {**patient, "comorbidities": []}
+
+
+def test_incremental_index_matches_rebuilt_index(client, patient):
+    rng = np.random.default_rng(0)
+    values = {
+        "anc": lambda: int(rng.integers(1000, 2500)),
+        "platelets": lambda: int(rng.integers(50000, 200000)),
+        "bilirubin": lambda: float(rng.uniform(0.5, 2)),
+        "creatinine_clearance": lambda: int(rng.integers(40, 90)),
+        "performance_status": lambda: int(rng.integers(0, 4)),
+        "nutritional_status": lambda: ["good", "poor"][rng.integers(2)],
+        "comorbidities": lambda: [[], ["diabetes"]][rng.integers(2)],
+    }
+    patient_ids = client.post("/patients:batch", json=[patient] * 50).json()["patient_ids"]
+    client.get("/patients/eligible", params={"treatment": "chemotherapy"})
+    for _ in range(200):
+        names = rng.choice(list(values), size=rng.integers(1, 4), replace=False)
+        client.patch(f"/patients/{rng.choice(patient_ids)}", json={name: values[name]() for name in names})
+
+    treatments = backend.registry.nodes_of_type("treatment")
+    index = backend.eligibility_index
+    index.update(treatments)
+    rebuilt = EligibilityIndex(backend.registry.patients, backend.patient_edge_weights)
+    rebuilt.update(treatments)
+    for treatment in treatments:
+        assert (index.eligible(treatment) == rebuilt.eligible(treatment)).all()
+        assert (index.scores(treatment) == rebuilt.scores(treatment)).all()
+
+
+def test_metrics_count_nodes_by_type(client, patient):
+    client.post("/patients:batch", json=[patient] * 3)
+    lines = client.get("/metrics").text.splitlines()
+    assert 'graph_nodes{type="patient"} 3' in lines
+    assert 'graph_nodes{type="treatment"} 3' in lines
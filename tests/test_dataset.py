@@ -0,0 +1,20 @@
+import os
+
+import dataset
+import simulate1
+
+
+def test_cached_dataset_matches_csv(tmp_path, monkeypatch):
+    monkeypatch.setattr(dataset, "CACHE_DIR", str(tmp_path / "cache"))
+    source = tmp_path / "data.csv"
+    source.write_text("id,diagnosis,radius_mean,texture_mean,Unnamed: 32\n1,M,17.99,10.38,\n2,B,13.54,,\n3,B,11.42,20.38,\n")
+
+    data = dataset.load_dataset(str(source))
+    assert list(data.columns) == ["diagnosis", "radius_mean", "texture_mean"]
+    assert data["diagnosis"].tolist() == [1, 0]
+    assert sorted(os.listdir(dataset._cache_path(os.path.abspath(source)))) == ["diagnosis.i1", "features.f4", "meta.json"]
+
+    final_tumor_size, _ = simulate1.simulate_treatment(data.iloc[0])
+    assert isinstance(final_tumor_size, float)
+    expected = simulate1.simulate_patient_response(179.9, 50, 180, 70, 40)[1][-1]
+    assert abs(final_tumor_size - expected) < 1e-4
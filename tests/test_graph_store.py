@@ -0,0 +1,67 @@
+import graph_store
+from backend import GraphRegistry, create_graph
+
+
+def test_rewritten_node_is_returned_again(tmp_path):
+    path = str(tmp_path / "graph.sqlite3")
+    writer, reader = graph_store.GraphStore(path), graph_store.GraphStore(path)
+    writer.add_node("patient_1", "patient", {"anc": 2000})
+    writer.add_edge("patient_1", "chemotherapy", {"weight": 0.5})
+    writer.flush()
+    nodes, edges, node_seq, edge_seq = reader.changes_since()
+    assert nodes == [("patient_1", {"anc": 2000, "type": "patient"})]
+
+    writer.add_node("patient_1", "patient", {"anc": 900})
+    writer.add_edge("patient_1", "chemotherapy", {"weight": 0.2})
+    writer.flush()
+    nodes, edges, _, _ = reader.changes_since(node_seq, edge_seq)
+    assert nodes == [("patient_1", {"anc": 900, "type": "patient"})]
+    assert edges == [("patient_1", "chemotherapy", {"weight": 0.2})]
+    writer.close()
+    reader.close()
+
+
+def test_patient_update_reaches_other_registries(tmp_path, patient):
+    path = str(tmp_path / "graph.sqlite3")
+    store_a, store_b = graph_store.GraphStore(path), graph_store.GraphStore(path)
+    worker_a = GraphRegistry(create_graph(), store_a)
+    patient_id = worker_a.next_patient_id()
+    worker_a.add_patient(patient_id, patient)
+    worker_a.commit()
+
+    worker_b = GraphRegistry(create_graph(), store_b)
+    assert worker_b.patient(patient_id)["anc"] == 2000
+    version = worker_b.version(patient_id)
+
+    worker_a.update_patient(patient_id, {"anc": 900})
+    worker_a.commit()
+    worker_b.sync()
+    assert worker_b.patient(patient_id)["anc"] == 900
+    assert worker_b.patient(patient_id)["platelets"] == 150000
+    assert worker_b.version(patient_id) != version
+    assert worker_b.count("patient") == 1
+    store_a.close()
+    store_b.close()
+
+
+def test_concurrent_updates_of_different_fields_are_merged(tmp_path, patient):
+    path = str(tmp_path / "graph.sqlite3")
+    store_a, store_b = graph_store.GraphStore(path), graph_store.GraphStore(path)
+    worker_a = GraphRegistry(create_graph(), store_a)
+    patient_id = worker_a.next_patient_id()
+    worker_a.add_patient(patient_id, patient)
+    worker_a.commit()
+    worker_b = GraphRegistry(create_graph(), store_b)
+
+    # Neither worker has seen the other's update when writing its own
+    worker_a.update_patient(patient_id, {"anc": 900})
+    worker_b.update_patient(patient_id, {"platelets": 90000})
+    worker_a.commit()
+    worker_b.commit()
+    for worker in (worker_a, worker_b):
+        worker.sync()
+        assert worker.patient(patient_id)["anc"] == 900
+        assert worker.patient(patient_id)["platelets"] == 90000
+    assert GraphRegistry(create_graph(), graph_store.GraphStore(path)).patient(patient_id) == worker_a.patient(patient_id)
+    store_a.close()
+    store_b.close()
@@ -0,0 +1,21 @@
+import pytest
+
+from patient_table import PatientTable
+
+
+def test_failed_append_leaves_table_unchanged(patient):
+    table = PatientTable(capacity=2)
+    table.append(patient)
+    with pytest.raises(OverflowError):
+        table.append({**patient, "platelets": 3_000_000_000})
+    assert len(table) == 1
+    assert table.append({**patient, "anc": 900}) == 1
+    assert table.get(1) == {**table.get(0), "anc": 900}
+
+
+def test_failed_extend_leaves_table_unchanged(patient):
+    table = PatientTable(capacity=2)
+    with pytest.raises(OverflowError):
+        table.extend([patient, {**patient, "age": 2 ** 40}])
+    assert len(table) == 0
+    assert list(table.extend([patient])) == [0]
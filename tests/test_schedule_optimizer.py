@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+
+import schedule_optimizer
+
+
+@pytest.mark.parametrize("time_steps, dt", [(180, 1), (4320, 1 / 24)])
+def test_final_values_match_simulation(time_steps, dt):
+    rng = np.random.default_rng(0)
+    doses, intervals = rng.uniform(10, 120, 50), rng.integers(1, 60, 50)
+    cycle_scales = rng.uniform(0, 1.5, (50, 10))
+    schedules = schedule_optimizer.build_schedules(doses, intervals, time_steps, cycle_scales)
+    expected = schedule_optimizer.evaluate_schedules(schedules, dt=dt)
+    actual = schedule_optimizer.final_values(doses, intervals, time_steps, cycle_scales, dt=dt)
+    np.testing.assert_allclose(actual, expected, rtol=1e-9, atol=1e-9)
+
+
+def test_optimize_schedule_rejects_fixed_dosing():
+    with pytest.raises(ValueError):
+        schedule_optimizer.optimize_schedule(dose_interval=14)
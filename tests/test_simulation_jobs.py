@@ -0,0 +1,50 @@
+import time
+
+import pytest
+
+import simulation_jobs
+
+
+def wait_until_finished(jobs, job_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = jobs.get(job_id, with_result=True)
+        if job.finished:
+            return job
+        time.sleep(0.05)
+    raise TimeoutError(job_id)
+
+
+@pytest.mark.parametrize("kind, params", [
+    ("doxorubicin", {"time_steps": -1}),
+    ("tumor_growth", {"steps": -5}),
+    ("regimen", {"regimens": [], "days": 0}),
+    ("monte_carlo", {"model": "tumor_growth", "time_steps": 0, "replicates": 10}),
+])
+def test_check_params_rejects_empty_horizons(kind, params):
+    with pytest.raises(ValueError):
+        simulation_jobs.check_params(kind, params)
+
+
+def test_jobs_are_shared_between_queues(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    first = simulation_jobs.JobQueue(path, workers=1)
+    second = simulation_jobs.JobQueue(path, workers=1)
+    try:
+        job = first.submit("tumor_growth", {"growth_rate": [0.1, 0.2], "steps": 10}, patient_id="patient_1")
+        done = wait_until_finished(second, job.id)
+        assert done.status == "done"
+        assert done.patient_id == "patient_1"
+        assert len(done.result["tumor_size"]) == 2
+        # Only one of the queues runs simulations
+        assert (first._executor is None) != (second._executor is None)
+
+        long_job = second.submit("doxorubicin", {"time_steps": 20_000, "elimination_rate": [0.1] * 200})
+        while first.get(long_job.id).status == "queued":
+            time.sleep(0.05)
+        first.cancel(long_job.id)
+        assert wait_until_finished(second, long_job.id).status == "cancelled"
+        assert first.counts() == {("done",): 1, ("cancelled",): 1}
+    finally:
+        first.shutdown()
+        second.shutdown()
@@ -0,0 +1,18 @@
+import numpy as np
+
+import trajectory_store
+
+
+def test_tolerance_holds_for_float32_knots(tmp_path):
+    rng = np.random.default_rng(0)
+    time = np.arange(365.0)
+    values = 1000 / (1 + 9 * np.exp(-rng.uniform(0.01, 0.05, (200, 1)) * time)) + rng.normal(0, 1e-3, (200, 365))
+    path = str(tmp_path / "trajectories.npz")
+    trajectory_store.save_trajectories(path, time, {"tumor_size": values}, tolerance=0.01)
+
+    archive = trajectory_store.TrajectoryArchive(path)
+    assert archive._series("tumor_size")["values"].dtype == np.float32
+    assert np.abs(archive.reconstruct("tumor_size") - values).max() <= 0.01
+    rows = [3, 150]
+    np.testing.assert_array_equal(archive.reconstruct("tumor_size", rows), archive.reconstruct("tumor_size")[rows])
+    archive.close()
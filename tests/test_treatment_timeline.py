@@ -0,0 +1,13 @@
+import numpy as np
+
+import treatment_timeline
+
+
+def test_simulate_treatment_matches_per_day_model():
+    results = treatment_timeline.simulate_treatment("chemotherapy")
+    day = np.arange(1, treatment_timeline.days + 1)
+    assert results["day"].tolist() == day.tolist()
+    assert results["wbc_count"].dtype == np.int64
+    assert results["wbc_count"].tolist() == (5000 - 50 * day).tolist()
+    np.testing.assert_allclose(results["tumor_size"], 5.0 - 0.05 * day)
+    np.testing.assert_allclose(results["creatinine"], 1.0 + 0.005 * day)
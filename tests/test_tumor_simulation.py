@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+import tumor_simulation
+
+
+def test_rk45_step_limit_applies_per_output_interval(monkeypatch):
+    monkeypatch.setattr(tumor_simulation, "RK45_MAX_STEPS", 20)
+    t_eval = np.linspace(0, 100, 201)
+    sizes = tumor_simulation.integrate_tumor_growth([0.1], [1000.0], [0.02], t_eval=t_eval, method="rk45")
+    exact = tumor_simulation.integrate_tumor_growth([0.1], [1000.0], [0.02], t_eval=t_eval)
+    np.testing.assert_allclose(sizes, exact, rtol=1e-4)
+
+
+def test_rk45_rejects_non_finite_values():
+    with pytest.raises(ValueError):
+        tumor_simulation.integrate_tumor_growth([0.1], [0.0], [0.0], t_eval=np.arange(5.0), method="rk45")
+
+
+class Stop(Exception):
+    pass
+
+
+def _stop(done, total):
+    raise Stop
+
+
+@pytest.mark.parametrize("name", ["sweep.npz", "sweep.parquet"])
+def test_aborted_sweep_leaves_no_files(tmp_path, name):
+    if name.endswith(".parquet"):
+        pytest.importorskip("pyarrow")
+    with pytest.raises(Stop):
+        tumor_simulation.run_parameter_sweep([0.1, 0.2], [1000.0], [0.0, 0.01], str(tmp_path / name),
+                                             chunk_size=2, processes=1, progress=_stop, steps=10)
+    assert list(tmp_path.iterdir()) == []
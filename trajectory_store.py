@@ -0,0 +1,244 @@
+import json
+
+import numpy as np
+
+# Bump when the archive layout changes
+FORMAT_VERSION = 2
+
+# Largest relative error of rounding a float64 to float32
+FLOAT32_ROUNDING = 2.0 ** -24
+
+
+def dose_days(num_days, interval, first=0):
+    """Boolean (num_days,) mask of the days a dose is given every `interval` days from `first`."""
+    days = np.arange(num_days)
+    return (days >= first) & ((days - first) % interval == 0)
+
+
+def threshold_crossings(values, threshold):
+    """Boolean mask of the samples on either side of a crossing of `threshold`, shape like `values`."""
+    values = np.atleast_2d(values)
+    above = values > threshold
+    crossed = above[:, 1:] != above[:, :-1]
+    mask = np.zeros(values.shape, dtype=bool)
+    mask[:, 1:] |= crossed
+    mask[:, :-1] |= crossed
+    return mask
+
+
+def select_samples(values, stride=None, events=None, tolerance=None):
+    """Choose which samples of each trajectory to store.
+
+    Without any option every sample is kept. Otherwise the first and last
+    samples are always kept, `stride` keeps every k-th sample and `events`
+    adds a (T,) or (N, T) mask of samples to keep, such as `dose_days` or
+    `threshold_crossings`. With `tolerance`, the kept samples are
+    instead the knots of a piecewise-linear fit whose interpolation stays
+    within `tolerance` of every original sample, chosen in one pass over time
+    for all rows at once (swinging-door compression).
+
+    Args:
+        values (np.ndarray): Trajectories, shape (N, T).
+        stride (int, optional): Keep every `stride`-th sample.
+        events (np.ndarray, optional): Extra samples to keep.
+        tolerance (float, optional): Maximum absolute interpolation error.
+
+    Returns:
+        tuple: (mask, samples), both (N, T). `samples` holds the values to store
+        at the masked positions; it differs from `values` only at knots of the
+        piecewise-linear fit.
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=float))
+    if tolerance is not None:
+        return _linear_knots(values, tolerance)
+    if not stride and events is None:
+        return np.ones(values.shape, dtype=bool), values
+    mask = np.zeros(values.shape, dtype=bool)
+    mask[:, [0, -1]] = True
+    if stride:
+        mask[:, ::stride] = True
+    if events is not None:
+        mask |= np.broadcast_to(events, values.shape)
+    return mask, values
+
+
+def _linear_knots(values, tolerance):
+    n, steps = values.shape
+    mask = np.zeros((n, steps), dtype=bool)
+    samples = values.copy()
+    mask[:, 0] = True
+    rows = np.arange(n)
+    anchor = np.zeros(n, dtype=np.int64)
+    anchor_value = values[:, 0].copy()
+    low = np.full(n, -np.inf)
+    high = np.full(n, np.inf)
+
+    for t in range(1, steps):
+        span = t - anchor
+        new_low = np.maximum(low, (values[:, t] - tolerance - anchor_value) / span)
+        new_high = np.minimum(high, (values[:, t] + tolerance - anchor_value) / span)
+        closed = new_low > new_high
+        if closed.any():
+            # End the segment at t - 1 on a line within every window so far,
+            # then start the next one from that knot
+            r = rows[closed]
+            knot = anchor_value[r] + (low[r] + high[r]) / 2 * (t - 1 - anchor[r])
+            mask[r, t - 1] = True
+            samples[r, t - 1] = knot
+            anchor[r], anchor_value[r] = t - 1, knot
+            new_low[r] = values[r, t] - tolerance - knot
+            new_high[r] = values[r, t] + tolerance - knot
+        low, high = new_low, new_high
+
+    last = steps - 1
+    open_rows = anchor < last
+    r = rows[open_rows]
+    samples[r, last] = anchor_value[r] + (low[r] + high[r]) / 2 * (last - anchor[r])
+    mask[:, last] = True
+    return mask, samples
+
+
+def encode(mask, samples, precision=None, dtype=np.float32):
+    """Pack the masked samples of (N, T) trajectories into flat arrays.
+
+    Samples are stored row by row with their day index. By default values are
+    stored as `dtype`. With `precision`, they are rounded to multiples of
+    `precision` and stored as differences between consecutive integers of the
+    same row, the first of each row as is. Such deltas compress far better
+    than raw floats when the archive is deflated; rounding adds up to
+    ``precision / 2`` of error.
+
+    Returns:
+        dict: Arrays "indptr" (N + 1,), "day" and "values" (or "deltas").
+    """
+    counts = mask.sum(axis=1)
+    indptr = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    day_dtype = np.uint16 if mask.shape[1] <= np.iinfo(np.uint16).max + 1 else np.int32
+    encoded = {"indptr": indptr, "day": np.nonzero(mask)[1].astype(day_dtype)}
+    values = samples[mask]
+    if precision is None:
+        encoded["values"] = values.astype(dtype)
+    else:
+        quantized = np.round(values / precision).astype(np.int64)
+        deltas = np.diff(quantized, prepend=0)
+        # Restart the chain at every row, so one row decodes on its own
+        starts = indptr[:-1][counts > 0]
+        deltas[starts] = quantized[starts]
+        fits = deltas.size == 0 or np.abs(deltas).max() <= np.iinfo(np.int32).max
+        encoded["deltas"] = deltas.astype(np.int32 if fits else np.int64)
+        encoded["precision"] = np.float64(precision)
+    return encoded
+
+
+def decode_samples(encoded, rows=None):
+    """Return the stored (day, value) samples of `rows` (default all) as flat arrays plus their row pointer."""
+    indptr = encoded["indptr"]
+    if rows is None:
+        index = slice(None)
+    else:
+        rows = np.atleast_1d(rows)
+        counts = indptr[rows + 1] - indptr[rows]
+        index = np.repeat(indptr[rows] - np.cumsum(np.concatenate([[0], counts[:-1]])), counts) + np.arange(counts.sum())
+        indptr = np.concatenate([[0], np.cumsum(counts)])
+    day = encoded["day"][index].astype(np.int64)
+    if "values" in encoded:
+        values = encoded["values"][index].astype(float)
+    else:
+        # Cumulative sum within each row: subtract the running total at the row start
+        totals = np.cumsum(encoded["deltas"][index], dtype=np.int64)
+        before = np.concatenate([[0], totals])[indptr[:-1]]
+        values = (totals - np.repeat(before, np.diff(indptr))) * float(encoded["precision"])
+    return indptr, day, values
+
+
+def reconstruct(encoded, steps, rows=None):
+    """Rebuild (len(rows), steps) trajectories by linear interpolation between stored samples.
+
+    Only the samples of `rows` are decoded.
+    """
+    indptr, day, values = decode_samples(encoded, rows)
+    n = len(indptr) - 1
+    row_of_sample = np.repeat(np.arange(n), np.diff(indptr))
+    keys = row_of_sample * steps + day
+
+    # Left and right stored samples around every requested (row, day)
+    query = (np.arange(n)[:, None] * steps + np.arange(steps)).ravel()
+    left = np.searchsorted(keys, query, side="right") - 1
+    right = np.minimum(left + 1, np.repeat(indptr[1:] - 1, steps))
+    span = (day[right] - day[left]).astype(float)
+    weight = np.divide(query - keys[left], span, out=np.zeros(len(query)), where=span > 0)
+    return (values[left] + weight * (values[right] - values[left])).reshape(n, steps)
+
+
+def save_trajectories(path, time, series, stride=None, events=None, tolerance=None, precision=None):
+    """Select, encode and write several trajectory arrays to a compressed ``.npz`` archive.
+
+    Args:
+        path (str): Destination file.
+        time (array-like): The (T,) sample times shared by all series.
+        series (dict): Name -> (N, T) trajectories, e.g. tumor size and health score.
+        stride, events, tolerance: Sample selection, see `select_samples`.
+            `events` may be a dict of per-series masks. `tolerance` may be a
+            dict of per-series tolerances. Values are stored as float32;
+            knots are fitted within the tolerance less the float32 rounding
+            of the values, so the error of the stored fit stays within it
+            unless it is below that rounding.
+        precision (float or dict, optional): Delta-encoding precision, see
+            `encode`. Rounding adds up to ``precision / 2`` to the error.
+
+    Returns:
+        int: Size of the archive in bytes.
+    """
+    arrays = {"time": np.asarray(time)}
+    meta = {"version": FORMAT_VERSION, "series": list(series)}
+    for name, values in series.items():
+        series_tolerance = tolerance.get(name) if isinstance(tolerance, dict) else tolerance
+        if series_tolerance is not None:
+            # Storing a knot as float32 moves it by up to half a unit in the
+            # last place, and the interpolated line between knots by no more
+            largest = np.abs(values).max(initial=0) + series_tolerance
+            series_tolerance = max(series_tolerance - largest * FLOAT32_ROUNDING, 0.0)
+        mask, samples = select_samples(
+            values, stride, events.get(name) if isinstance(events, dict) else events, series_tolerance,
+        )
+        encoded = encode(mask, samples, precision.get(name) if isinstance(precision, dict) else precision)
+        arrays.update({f"{name}/{key}": value for key, value in encoded.items()})
+    arrays["meta"] = np.frombuffer(json.dumps(meta).encode(), dtype=np.uint8)
+    with open(path, "wb") as f:
+        np.savez_compressed(f, **arrays)
+        return f.tell()
+
+
+class TrajectoryArchive:
+    """Read trajectories written by `save_trajectories`, decoding them on demand."""
+
+    def __init__(self, path):
+        self._arrays = np.load(path)
+        meta = json.loads(self._arrays["meta"].tobytes())
+        if meta["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported trajectory archive version {meta['version']}")
+        self.series = meta["series"]
+        self.time = self._arrays["time"]
+        self._encoded = {}
+
+    def _series(self, name):
+        if name not in self._encoded:
+            prefix = name + "/"
+            self._encoded[name] = {key[len(prefix):]: self._arrays[key]
+                                   for key in self._arrays.files if key.startswith(prefix)}
+        return self._encoded[name]
+
+    def __len__(self):
+        return len(self._series(self.series[0])["indptr"]) - 1
+
+    def samples(self, name, row):
+        """Stored (time, value) samples of one trajectory."""
+        _, day, values = decode_samples(self._series(name), row)
+        return self.time[day], values
+
+    def reconstruct(self, name, rows=None):
+        """Full-resolution (len(rows), T) trajectories, interpolated between the stored samples."""
+        return reconstruct(self._series(name), len(self.time), rows)
+
+    def close(self):
+        self._arrays.close()
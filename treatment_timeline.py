@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+from regimen import simulate_regimens
+
+# Define the simulation parameters
+days = 90  # Total simulation period in days
+
+# Initial patient parameters
+initial_tumor_size = 5.0  # cm
+initial_wbc_count = 5000  # cells/mm³
+initial_creatinine = 1.0  # mg/dL
+
+# Run simulations for each treatment
+def simulate_treatment(treatment_type, num_days=None):
+    num_days = days if num_days is None else num_days
+    results = simulate_regimens(
+        [[(treatment_type, 1, num_days)]],
+        days=num_days,
+        initial_values={
+            "tumor_size": initial_tumor_size,
+            "wbc_count": initial_wbc_count,
+            "creatinine": initial_creatinine,
+        },
+    )
+    return pd.DataFrame({
+        "day": results["day"],
+        "tumor_size": results["tumor_size"][0],
+        # Whole cells/mm³ as before the regimen simulator, which computes in float64
+        "wbc_count": np.rint(results["wbc_count"][0]).astype(np.int64),
+        "creatinine": results["creatinine"][0],
+    })
+
+def main():
+    import matplotlib.pyplot as plt
+
+    # Simulate each treatment
+    chemotherapy_results = simulate_treatment("chemotherapy")
+    immunotherapy_results = simulate_treatment("immunotherapy")
+    radiation_results = simulate_treatment("radiation")
+
+    # Plot the results
+    plt.figure(figsize=(12, 8))
+
+    # Tumor Size
+    plt.subplot(2, 2, 1)
+    plt.plot(chemotherapy_results['day'], chemotherapy_results['tumor_size'], label='Chemotherapy', color='r')
+    plt.plot(immunotherapy_results['day'], immunotherapy_results['tumor_size'], label='Immunotherapy', color='b')
+    plt.plot(radiation_results['day'], radiation_results['tumor_size'], label='Radiation', color='g')
+    plt.title('Tumor Size Over Time')
+    plt.xlabel('Days')
+    plt.ylabel('Tumor Size (cm)')
+    plt.legend()
+
+    # White Blood Cell Count
+    plt.subplot(2, 2, 2)
+    plt.plot(chemotherapy_results['day'], chemotherapy_results['wbc_count'], label='Chemotherapy', color='r')
+    plt.plot(immunotherapy_results['day'], immunotherapy_results['wbc_count'], label='Immunotherapy', color='b')
+    plt.plot(radiation_results['day'], radiation_results['wbc_count'], label='Radiation', color='g')
+    plt.title('WBC Count Over Time')
+    plt.xlabel('Days')
+    plt.ylabel('WBC Count (cells/mm³)')
+    plt.legend()
+
+    # Creatinine
+    plt.subplot(2, 2, 3)
+    plt.plot(chemotherapy_results['day'], chemotherapy_results['creatinine'], label='Chemotherapy', color='r')
+    plt.plot(immunotherapy_results['day'], immunotherapy_results['creatinine'], label='Immunotherapy', color='b')
+    plt.plot(radiation_results['day'], radiation_results['creatinine'], label='Radiation', color='g')
+    plt.title('Creatinine Levels Over Time')
+    plt.xlabel('Days')
+    plt.ylabel('Creatinine (mg/dL)')
+    plt.legend()
+
+    plt.tight_layout()
+    plt.show()
+
+    # Output the final results after 90 days
+    final_results = {
+        "Treatment": ["Chemotherapy", "Immunotherapy", "Radiation"],
+        "Final Tumor Size (cm)": [
+            chemotherapy_results["tumor_size"].iloc[-1],
+            immunotherapy_results["tumor_size"].iloc[-1],
+            radiation_results["tumor_size"].iloc[-1]
+        ],
+        "Final WBC Count (cells/mm³)": [
+            chemotherapy_results["wbc_count"].iloc[-1],
+            immunotherapy_results["wbc_count"].iloc[-1],
+            radiation_results["wbc_count"].iloc[-1]
+        ],
+        "Final Creatinine (mg/dL)": [
+            chemotherapy_results["creatinine"].iloc[-1],
+            immunotherapy_results["creatinine"].iloc[-1],
+            radiation_results["creatinine"].iloc[-1]
+        ]
+    }
+
+    final_df = pd.DataFrame(final_results)
+    print(final_df)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,10 @@
+import os
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
-import matplotlib.pyplot as plt
 
 # Parameters for the tumor growth model
 initial_tumor_size = 1  # initial tumor size (in arbitrary units)
@@ -14,44 +19,356 @@ radiation_effect = 0.05  # radiation reduces growth rate by 5%
 # Time parameters
 time_steps = 100  # total number of time steps (days, weeks, etc.)
 
+# Columns written by run_parameter_sweep, in order
+SWEEP_COLUMNS = ("growth_rate", "max_tumor_size", "therapy_effect", "final_tumor_size")
+
 # Function to simulate tumor growth
-def simulate_tumor_growth(therapy_effect=0.0):
+def simulate_tumor_growth(therapy_effect=0.0, growth_rate=None, max_size=None, steps=None):
+    """Simulate logistic tumor growth under a constant therapy effect.
+
+    `growth_rate`, `max_size` and `steps` default to the module parameters
+    `base_growth_rate`, `max_tumor_size` and `time_steps`.
+    """
+    growth_rate = base_growth_rate if growth_rate is None else growth_rate
+    max_size = max_tumor_size if max_size is None else max_size
+    steps = time_steps if steps is None else steps
+
     tumor_size = initial_tumor_size
     tumor_sizes = [tumor_size]
-    
-    for t in range(1, time_steps):
+
+    for t in range(1, steps):
         # Apply logistic growth model: dN/dt = r * N * (1 - N/K)
-        growth_rate_effective = base_growth_rate * (1 - tumor_size / max_tumor_size) - therapy_effect
+        growth_rate_effective = growth_rate * (1 - tumor_size / max_size) - therapy_effect
         tumor_size += growth_rate_effective * tumor_size
         tumor_size = max(tumor_size, 0)  # Ensure tumor size doesn't go negative
-        tumor_size = min(tumor_size, max_tumor_size)  # Ensure it doesn't exceed the max size
+        tumor_size = min(tumor_size, max_size)  # Ensure it doesn't exceed the max size
         tumor_sizes.append(tumor_size)
-    
+
     return tumor_sizes
 
-# Simulate tumor growth for each therapy
-chemotherapy_tumor_growth = simulate_tumor_growth(chemotherapy_effect)
-immunotherapy_tumor_growth = simulate_tumor_growth(immunotherapy_effect)
-radiation_tumor_growth = simulate_tumor_growth(radiation_effect)
-no_therapy_tumor_growth = simulate_tumor_growth(0.0)
-
-# Plot the results
-plt.figure(figsize=(10, 6))
-
-plt.plot(chemotherapy_tumor_growth, label='Chemotherapy', color='red')
-plt.plot(immunotherapy_tumor_growth, label='Immunotherapy', color='blue')
-plt.plot(radiation_tumor_growth, label='Radiation', color='green')
-plt.plot(no_therapy_tumor_growth, label='No Therapy', color='black', linestyle='--')
-
-plt.title('Tumor Growth with Different Therapies')
-plt.xlabel('Time (days or weeks)')
-plt.ylabel('Tumor Size (arbitrary units)')
-plt.legend()
-plt.grid(True)
-plt.show()
-
-# Conclusion: Print out final tumor sizes after treatment
-print(f"Final tumor size with chemotherapy: {chemotherapy_tumor_growth[-1]:.2f}")
-print(f"Final tumor size with immunotherapy: {immunotherapy_tumor_growth[-1]:.2f}")
-print(f"Final tumor size with radiation: {radiation_tumor_growth[-1]:.2f}")
-print(f"Final tumor size with no therapy: {no_therapy_tumor_growth[-1]:.2f}")
+# Function to simulate many parameter combinations at once
+def simulate_tumor_growth_batch(growth_rates, max_sizes, therapy_effects, initial_size=None, steps=None,
+                                trajectories=True, progress=None):
+    """Simulate logistic tumor growth for N parameter sets with array operations.
+
+    Applies the same update and clamping as `simulate_tumor_growth`. Scalar
+    arguments are broadcast against the per-tumor arrays.
+
+    Args:
+        growth_rates (array-like): Base growth rates, shape (N,).
+        max_sizes (array-like): Carrying capacities, shape (N,).
+        therapy_effects (array-like): Therapy effects, shape (N,).
+        initial_size (float or array-like, optional): Initial tumor sizes.
+            Defaults to `initial_tumor_size`.
+        steps (int, optional): Number of time steps. Defaults to `time_steps`.
+        trajectories (bool): Return the full (N, steps) trajectories if True,
+            otherwise only the final sizes of shape (N,).
+        progress (callable, optional): Called as ``progress(step, steps)``
+            after every step; may raise to stop the simulation.
+    """
+    initial_size = initial_tumor_size if initial_size is None else initial_size
+    steps = time_steps if steps is None else steps
+    growth_rates, max_sizes, therapy_effects, tumor_size = (
+        a.astype(float) for a in np.broadcast_arrays(
+            *(np.atleast_1d(np.asarray(a, dtype=float)) for a in (growth_rates, max_sizes, therapy_effects, initial_size))
+        )
+    )
+
+    tumor_sizes = np.empty(tumor_size.shape + (steps,)) if trajectories else None
+    if trajectories:
+        tumor_sizes[:, 0] = tumor_size
+    for t in range(1, steps):
+        growth_rate_effective = growth_rates * (1 - tumor_size / max_sizes) - therapy_effects
+        tumor_size += growth_rate_effective * tumor_size
+        np.clip(tumor_size, 0, max_sizes, out=tumor_size)
+        if trajectories:
+            tumor_sizes[:, t] = tumor_size
+        if progress is not None:
+            progress(t + 1, steps)
+
+    return tumor_sizes if trajectories else tumor_size
+
+# Continuous-time integration of the logistic model for many tumors
+def integrate_tumor_growth(growth_rates, max_sizes, therapy_effects, t_eval=None, initial_size=None,
+                           method="exact", rtol=1e-6, atol=1e-9):
+    """Integrate dN/dt = r * N * (1 - N/K) - effect * N for N tumors at once.
+
+    Unlike the Euler update in `simulate_tumor_growth`, accuracy does not depend
+    on a step count. With ``method="exact"`` the closed-form solution of the
+    logistic equation (the therapy effect only lowers the net growth rate and
+    the effective carrying capacity) is evaluated directly at `t_eval`. With
+    ``method="rk45"`` an adaptive Dormand-Prince 5(4) integrator is used, whose
+    step is shared by all tumors and chosen so the scaled local error stays
+    within `rtol`/`atol`; this also accepts a therapy effect that varies with
+    time, given as a callable ``therapy_effects(t)``. Because the step is
+    shared, the fastest-growing tumor in the batch sets it, so prefer "exact"
+    whenever the effects are constant.
+
+    Args:
+        growth_rates (array-like): Base growth rates r, shape (N,).
+        max_sizes (array-like): Carrying capacities K, shape (N,).
+        therapy_effects (array-like or callable): Therapy effects, shape (N,),
+            or a function of time returning them (rk45 only).
+        t_eval (array-like, optional): Increasing output times. Defaults to
+            ``range(time_steps)``.
+        initial_size (float or array-like, optional): Initial tumor sizes.
+            Defaults to `initial_tumor_size`.
+        method (str): "exact" or "rk45".
+        rtol (float): Relative tolerance for rk45.
+        atol (float): Absolute tolerance for rk45.
+
+    Returns:
+        np.ndarray: Tumor sizes of shape (N, len(t_eval)).
+
+    Raises:
+        ValueError: If rk45 meets non-finite values, e.g. a zero carrying capacity.
+        RuntimeError: If rk45 needs more than `RK45_MAX_STEPS` steps between
+            two consecutive times of `t_eval`.
+    """
+    t_eval = np.arange(time_steps, dtype=float) if t_eval is None else np.asarray(t_eval, dtype=float)
+    initial_size = initial_tumor_size if initial_size is None else initial_size
+    constant_effects = 0.0 if callable(therapy_effects) else therapy_effects
+    growth_rates, max_sizes, tumor_size, constant_effects = (
+        a.astype(float) for a in np.broadcast_arrays(
+            *(np.atleast_1d(np.asarray(a, dtype=float)) for a in (growth_rates, max_sizes, initial_size, constant_effects))
+        )
+    )
+    effect = therapy_effects if callable(therapy_effects) else (lambda t: constant_effects)
+
+    if method == "exact":
+        if callable(therapy_effects):
+            raise ValueError("The exact solution needs constant therapy effects; use method='rk45'.")
+        return _exact_logistic(tumor_size, growth_rates, max_sizes, growth_rates - constant_effects, t_eval - t_eval[0])
+    if method == "rk45":
+        def rhs(t, n):
+            return growth_rates * n * (1 - n / max_sizes) - effect(t) * n
+        return _dormand_prince(rhs, tumor_size, t_eval, rtol, atol)
+    raise ValueError(f"Unknown method: {method}")
+
+def _exact_logistic(n0, growth_rates, max_sizes, net_rate, t):
+    """Closed-form logistic solution, written so that no term overflows.
+
+    N(t) = N0 / (exp(-a t) + (r / K) * N0 * (1 - exp(-a t)) / a) with a = r - effect;
+    (1 - exp(-a t)) / a tends to t as a -> 0.
+    """
+    n0, r_over_k, a = n0[:, None], (growth_rates / max_sizes)[:, None], net_rate[:, None]
+    with np.errstate(over="ignore", divide="ignore", invalid="ignore"):
+        decay = np.exp(-a * t)
+        growth_integral = np.where(a == 0, t, -np.expm1(-a * t) / np.where(a == 0, 1, a))
+        return n0 / (decay + r_over_k * n0 * growth_integral)
+
+# Attempted steps between two output times after which the rk45 integrator gives up
+RK45_MAX_STEPS = 100_000
+
+# Dormand-Prince 5(4) tableau
+_DP_C = np.array([0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1, 1])
+_DP_A = [
+    [],
+    [1 / 5],
+    [3 / 40, 9 / 40],
+    [44 / 45, -56 / 15, 32 / 9],
+    [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729],
+    [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656],
+    [35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84],
+]
+_DP_B5 = np.array([35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0])
+_DP_B4 = np.array([5179 / 57600, 0, 7571 / 16695, 393 / 640, -92097 / 339200, 187 / 2100, 1 / 40])
+
+def _dormand_prince(rhs, y0, t_eval, rtol, atol):
+    """Adaptive RK45 over a vector state with one shared step size, landing on every t_eval."""
+    out = np.empty(y0.shape + t_eval.shape)
+    y, t = y0.copy(), t_eval[0]
+    out[:, 0] = y
+    span = t_eval[-1] - t_eval[0]
+    h = 0.01 * span if span > 0 else 0.0
+    k = np.empty((7,) + y.shape)
+    for i, t_next in enumerate(t_eval[1:], start=1):
+        attempts = 0
+        while t < t_next:
+            attempts += 1
+            if attempts > RK45_MAX_STEPS:
+                raise RuntimeError(f"rk45 needed more than {RK45_MAX_STEPS} steps from t={t_eval[i - 1]} to t={t_next} (stuck at t={t})")
+            # Shorten the step to land on t_next, but keep the proposed size for later steps
+            step = min(h, t_next - t)
+            k[0] = rhs(t, y)
+            for s in range(1, 7):
+                k[s] = rhs(t + _DP_C[s] * step, y + step * np.tensordot(_DP_A[s], k[:s], axes=1))
+            y_new = y + step * np.tensordot(_DP_B5, k, axes=1)
+            error = step * np.tensordot(_DP_B5 - _DP_B4, k, axes=1)
+            scale = atol + rtol * np.maximum(np.abs(y), np.abs(y_new))
+            error_norm = np.max(np.abs(error) / scale) if y.size else 0.0
+            if not np.isfinite(error_norm):
+                raise ValueError(f"rk45 produced non-finite values at t={t}; check for zero carrying capacities")
+            # Standard step-size update for a 5th-order method
+            factor = min(10.0, max(0.2, 0.9 * error_norm ** -0.2)) if error_norm > 0 else 10.0
+            if error_norm <= 1:
+                t, y = t + step, y_new
+                # A step shortened only to land on t_next must not shrink later steps
+                h = max(h, step * factor) if step < h else step * factor
+            else:
+                h = step * factor
+        out[:, i] = y
+    return out
+
+# Parameter sweep over a grid, spread across a process pool
+def run_parameter_sweep(growth_rates, max_sizes, therapy_effects, output_path, chunk_size=50_000,
+                        processes=None, progress=None, initial_size=None, steps=None):
+    """Simulate every combination of the given parameter values and save the final sizes.
+
+    The grid is the Cartesian product of the three 1-D axes. It is split into
+    chunks of `chunk_size` points that are simulated in a process pool; each
+    worker only receives the axes and its index range. Results are streamed to
+    disk in grid order as columns `SWEEP_COLUMNS`: a ``.parquet`` path is written
+    row group by row group (requires pyarrow), any other path is written as an
+    ``.npz`` archive assembled from memory-mapped columns.
+
+    Args:
+        growth_rates (array-like): Growth rate axis.
+        max_sizes (array-like): Carrying capacity axis.
+        therapy_effects (array-like): Therapy effect axis.
+        output_path (str): Destination file.
+        chunk_size (int): Grid points per task.
+        processes (int, optional): Worker processes. Defaults to the CPU count;
+            1 runs the sweep in the current process.
+        progress (callable, optional): Called as ``progress(done, total)`` after
+            each chunk is written.
+        initial_size (float, optional): Initial tumor size for every point.
+        steps (int, optional): Number of time steps for every point.
+
+    Returns:
+        int: Number of grid points simulated.
+    """
+    axes = tuple(np.atleast_1d(np.asarray(a, dtype=float)) for a in (growth_rates, max_sizes, therapy_effects))
+    initial_size = initial_tumor_size if initial_size is None else initial_size
+    steps = time_steps if steps is None else steps
+    total = int(np.prod([len(a) for a in axes]))
+    tasks = [(start, min(start + chunk_size, total), axes, initial_size, steps)
+             for start in range(0, total, chunk_size)]
+
+    writer = _ParquetSweepWriter(output_path) if str(output_path).endswith(".parquet") else _NpzSweepWriter(output_path, total)
+    executor = ProcessPoolExecutor(processes) if processes != 1 else None
+    try:
+        results = executor.map(_sweep_chunk, tasks) if executor else map(_sweep_chunk, tasks)
+        done = 0
+        for (start, stop, *_), final_sizes in zip(tasks, results):
+            writer.write(start, stop, _grid_points(axes, start, stop) + (final_sizes,))
+            done = stop
+            if progress is not None:
+                progress(done, total)
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+    return total
+
+def _grid_points(axes, start, stop):
+    """Parameter values of the flattened grid points start..stop."""
+    index = np.unravel_index(np.arange(start, stop), [len(a) for a in axes])
+    return tuple(a[i] for a, i in zip(axes, index))
+
+def _sweep_chunk(task):
+    """Simulate one chunk of the sweep grid; runs in a worker process."""
+    start, stop, axes, initial_size, steps = task
+    growth_rates, max_sizes, therapy_effects = _grid_points(axes, start, stop)
+    return simulate_tumor_growth_batch(growth_rates, max_sizes, therapy_effects, initial_size, steps,
+                                       trajectories=False)
+
+class _NpzSweepWriter:
+    """Fill memory-mapped .npy columns, then pack them into an uncompressed .npz."""
+
+    def __init__(self, output_path, total):
+        self.output_path = output_path
+        self.tmpdir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(output_path)))
+        self.columns = {
+            name: np.lib.format.open_memmap(os.path.join(self.tmpdir, name + ".npy"), mode="w+",
+                                            dtype=np.float64, shape=(total,))
+            for name in SWEEP_COLUMNS
+        }
+
+    def write(self, start, stop, values):
+        for name, column in zip(SWEEP_COLUMNS, values):
+            self.columns[name][start:stop] = column
+
+    def close(self):
+        for column in self.columns.values():
+            column.flush()
+        self.columns.clear()
+        with zipfile.ZipFile(self.output_path, "w", zipfile.ZIP_STORED, allowZip64=True) as archive:
+            for name in SWEEP_COLUMNS:
+                archive.write(os.path.join(self.tmpdir, name + ".npy"), name + ".npy")
+        shutil.rmtree(self.tmpdir)
+
+    def abort(self):
+        self.columns.clear()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+class _ParquetSweepWriter:
+    """Append each chunk as a Parquet row group of a temporary file, renamed to the output on close."""
+
+    def __init__(self, output_path):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as exc:
+            raise ImportError("Writing a .parquet sweep requires pyarrow; use an .npz path instead.") from exc
+        self.pa = pa
+        self.schema = pa.schema([(name, pa.float64()) for name in SWEEP_COLUMNS])
+        self.output_path = output_path
+        fd, self.tmp_path = tempfile.mkstemp(suffix=".parquet", dir=os.path.dirname(os.path.abspath(output_path)))
+        os.close(fd)
+        self.writer = pq.ParquetWriter(self.tmp_path, self.schema)
+
+    def write(self, start, stop, values):
+        self.writer.write_table(self.pa.Table.from_arrays(list(values), schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+        os.replace(self.tmp_path, self.output_path)
+
+    def abort(self):
+        try:
+            self.writer.close()
+        finally:
+            os.remove(self.tmp_path)
+
+def plot_therapies(results):
+    """Plot the tumor size trajectories for each therapy."""
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(10, 6))
+
+    plt.plot(results['chemotherapy'], label='Chemotherapy', color='red')
+    plt.plot(results['immunotherapy'], label='Immunotherapy', color='blue')
+    plt.plot(results['radiation'], label='Radiation', color='green')
+    plt.plot(results['none'], label='No Therapy', color='black', linestyle='--')
+
+    plt.title('Tumor Growth with Different Therapies')
+    plt.xlabel('Time (days or weeks)')
+    plt.ylabel('Tumor Size (arbitrary units)')
+    plt.legend()
+    plt.grid(True)
+    plt.show()
+
+def main():
+    # Simulate tumor growth for each therapy
+    results = {
+        'chemotherapy': simulate_tumor_growth(chemotherapy_effect),
+        'immunotherapy': simulate_tumor_growth(immunotherapy_effect),
+        'radiation': simulate_tumor_growth(radiation_effect),
+        'none': simulate_tumor_growth(0.0),
+    }
+
+    # Plot the results
+    plot_therapies(results)
+
+    # Conclusion: Print out final tumor sizes after treatment
+    print(f"Final tumor size with chemotherapy: {results['chemotherapy'][-1]:.2f}")
+    print(f"Final tumor size with immunotherapy: {results['immunotherapy'][-1]:.2f}")
+    print(f"Final tumor size with radiation: {results['radiation'][-1]:.2f}")
+    print(f"Final tumor size with no therapy: {results['none'][-1]:.2f}")
+
+if __name__ == "__main__":
+    main()